@@ -15,4 +15,5 @@
 #
 
 from .metadata import ModelMetadataAPI  # noqa
-from .predict import ModelLabelsAPI, ModelPredictAPI  # noqa
+from .predict import ModelLabelsAPI, ModelPredictAPI, ModelBatchPredictAPI  # noqa
+from .stats import ModelStatsAPI  # noqa
@@ -0,0 +1,260 @@
+#
+# Copyright 2018-2021 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import grpc
+
+from config import MAX_BATCH_SIZE, TILE_OVERLAP, INFERENCE_RETRY_AFTER
+from core.boxes import check_region_of_interest
+from core.inputs import tensor_from_bytes
+from core.memory import ImageTooLargeError, MemoryBudgetExceededError
+from core.scheduler import QueueFullError, DeadlineExceededError
+from protos import detector_pb2, detector_pb2_grpc
+from .predict import model_wrapper
+
+logger = logging.getLogger()
+
+DEFAULT_THRESHOLD = 0.7
+PRIORITY_METADATA = 'x-priority'
+API_KEY_METADATA = 'x-api-key'
+
+# marks the end of the request stream of a DetectStream call
+_END = object()
+
+
+class FrameError(Exception):
+    """Raised when a single frame cannot be processed, with the status code it is reported with."""
+
+    def __init__(self, code, message):
+        super(FrameError, self).__init__(message)
+        self.code = code
+
+
+class Frame(object):
+    """A request, its validated arguments and the state of its processing."""
+
+    def __init__(self, request):
+        self.request = request
+        self.image = None
+        self.cost = 0
+        self.fingerprint = None
+        self.detections = None
+        self.skipped = False
+        self.error = None
+        self.threshold = request.threshold or DEFAULT_THRESHOLD
+        self.tile_size = request.tile_size or None
+        self.rois = None
+        self.params = None
+
+    def read(self):
+        """Validate the arguments and read the input, without decoding an encoded image."""
+        request = self.request
+        if self.tile_size is not None and self.tile_size < 32:
+            raise FrameError(grpc.StatusCode.INVALID_ARGUMENT, 'tile_size must be at least 32 pixels')
+        try:
+            if request.roi:
+                self.rois = [check_region_of_interest(roi.ymin, roi.xmin, roi.ymax, roi.xmax) for roi in request.roi]
+            if request.WhichOneof('input') == 'image':
+                self.image = request.image
+            elif request.WhichOneof('input') == 'tensor':
+                if request.tensor.height < 1 or request.tensor.width < 1:
+                    raise ValueError('Tensor height and width must be positive')
+                self.image = tensor_from_bytes(request.tensor.data, (request.tensor.height, request.tensor.width, 3))
+            else:
+                raise FrameError(grpc.StatusCode.INVALID_ARGUMENT, 'One of image and tensor is required')
+            self.cost = model_wrapper._input_cost(self.image, self.tile_size, TILE_OVERLAP, self.rois)
+        except ImageTooLargeError as e:
+            raise FrameError(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        except ValueError as e:
+            raise FrameError(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        except IOError:
+            raise FrameError(grpc.StatusCode.INVALID_ARGUMENT, 'Unrecognized image format')
+        self.params = (self.threshold, self.tile_size, TILE_OVERLAP, repr(self.rois))
+
+    def response(self):
+        response = detector_pb2.DetectResponse(frame_id=self.request.frame_id, frame_skipped=self.skipped)
+        if self.error is not None:
+            response.error_code = self.error.code.value[0]
+            response.error_message = str(self.error)
+            return response
+        detections = self.detections
+        for label_id, label, probability, box in zip(detections['detection_classes'].tolist(),
+                                                     model_wrapper._label_names(detections['detection_classes']),
+                                                     detections['detection_scores'].tolist(),
+                                                     detections['detection_boxes'].tolist()):
+            response.detections.add(label_id=label_id, label=label, probability=probability,
+                                    box=detector_pb2.BoundingBox(ymin=box[0], xmin=box[1], ymax=box[2], xmax=box[3]))
+        return response
+
+
+def infer_frames(frames, deadline):
+    """Run decoded frames through the model.
+
+    Frames without regions of interest or tiling that share a threshold are run as one batch; the
+    others are run one at a time.
+    """
+    batches = {}
+    for frame in frames:
+        if frame.rois is None and frame.tile_size is None:
+            batches.setdefault(frame.threshold, []).append(frame)
+        else:
+            frame.detections = model_wrapper._predict(frame.image, frame.threshold, frame.tile_size, TILE_OVERLAP,
+                                                      frame.rois, deadline)
+    for threshold, batch in batches.items():
+        for frame, detections in zip(batch, model_wrapper._predict_batch([frame.image for frame in batch],
+                                                                         threshold, deadline)):
+            frame.detections = detections
+
+
+def read_requests(request_iterator, pending, context):
+    """Move the requests of a DetectStream call into a bounded queue, so that they can be batched"""
+    try:
+        for request in request_iterator:
+            while True:
+                try:
+                    pending.put(request, timeout=1)
+                    break
+                except queue.Full:
+                    if not context.is_active():
+                        return
+    except grpc.RpcError:
+        # the client cancelled the call or the connection was lost
+        pass
+    while context.is_active():
+        try:
+            pending.put(_END, timeout=1)
+            return
+        except queue.Full:
+            pass
+
+
+class ObjectDetectorService(detector_pb2_grpc.ObjectDetectorServicer):
+    """gRPC front-end sharing the model, inference queue and memory budget of the HTTP API.
+
+    Calls are queued in the priority lane selected by the `x-priority` or `x-api-key` metadata, and a
+    call deadline is applied to the inference queue like the deadline of an HTTP request.
+    """
+
+    def _lane(self, context):
+        metadata = dict(context.invocation_metadata())
+        try:
+            return model_wrapper.queue.lane_for(metadata.get(PRIORITY_METADATA), metadata.get(API_KEY_METADATA))
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+    def _deadline(self, context):
+        # without a client deadline, gRPC reports a remaining time far beyond what a wait accepts
+        remaining = context.time_remaining()
+        if remaining is None or remaining > threading.TIMEOUT_MAX:
+            return None
+        return time.monotonic() + remaining
+
+    def _detect_frames(self, requests, lane, deadline):
+        """Process a group of requests under one admission and inference slot, returning their frames"""
+        frames = [Frame(request) for request in requests]
+        try:
+            with model_wrapper.queue.admit(lane, deadline) as ticket:
+                for frame in frames:
+                    try:
+                        frame.read()
+                    except FrameError as e:
+                        frame.error = e
+                valid = [frame for frame in frames if frame.error is None]
+                # reserve memory for the inputs before they are decoded
+                with model_wrapper.memory.reserve(sum(frame.cost for frame in valid), deadline):
+                    encoded = [frame for frame in valid if isinstance(frame.image, bytes)]
+                    for frame, image in zip(encoded, model_wrapper._read_images([frame.image for frame in encoded])):
+                        if isinstance(image, IOError):
+                            frame.error = FrameError(grpc.StatusCode.INVALID_ARGUMENT, 'Unrecognized image format')
+                        frame.image = image
+                    pending = []
+                    for frame in valid:
+                        if frame.error is not None:
+                            continue
+                        if frame.request.stream_id:
+                            frame.detections, frame.fingerprint = model_wrapper.stream_cache.lookup(
+                                frame.request.stream_id, frame.image, frame.params)
+                            frame.skipped = frame.detections is not None
+                        if not frame.skipped:
+                            pending.append(frame)
+                    if pending:
+                        with model_wrapper.queue.slot(ticket):
+                            model_wrapper.pipeline.infer(infer_frames, pending, deadline).result()
+                    for frame in pending:
+                        if frame.request.stream_id:
+                            model_wrapper.stream_cache.store(frame.request.stream_id, frame.fingerprint,
+                                                             frame.params, frame.detections)
+        except (QueueFullError, MemoryBudgetExceededError):
+            error = FrameError(grpc.StatusCode.RESOURCE_EXHAUSTED, 'Server is busy, retry later')
+            for frame in frames:
+                frame.error = frame.error or error
+        except DeadlineExceededError:
+            error = FrameError(grpc.StatusCode.DEADLINE_EXCEEDED, 'Deadline exceeded before inference could run')
+            for frame in frames:
+                frame.error = frame.error or error
+        return frames
+
+    def Detect(self, request, context):
+        frame, = self._detect_frames([request], self._lane(context), self._deadline(context))
+        if frame.error is not None:
+            if frame.error.code == grpc.StatusCode.RESOURCE_EXHAUSTED:
+                context.set_trailing_metadata((('retry-after', str(INFERENCE_RETRY_AFTER)),))
+            context.abort(frame.error.code, str(frame.error))
+        return frame.response()
+
+    def DetectStream(self, request_iterator, context):
+        lane = self._lane(context)
+        deadline = self._deadline(context)
+        pending = queue.Queue(maxsize=2 * MAX_BATCH_SIZE)
+        threading.Thread(target=read_requests, args=(request_iterator, pending, context), daemon=True).start()
+
+        done = False
+        while not done:
+            try:
+                requests = [pending.get(timeout=1)]
+            except queue.Empty:
+                if not context.is_active():
+                    return
+                continue
+            # frames that arrived while the previous group was processed are run as one batch
+            while len(requests) < MAX_BATCH_SIZE:
+                try:
+                    requests.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+            if _END in requests:
+                requests = requests[:requests.index(_END)]
+                done = True
+            if requests:
+                for frame in self._detect_frames(requests, lane, deadline):
+                    yield frame.response()
+
+
+def start_grpc_server(port, workers, max_message_bytes):
+    """Start serving the gRPC API on a pool of `workers` threads, each of which handles one call at a time"""
+    server = grpc.server(ThreadPoolExecutor(max_workers=workers, thread_name_prefix='grpc'),
+                         options=[('grpc.max_receive_message_length', max_message_bytes),
+                                  ('grpc.max_send_message_length', max_message_bytes)])
+    detector_pb2_grpc.add_ObjectDetectorServicer_to_server(ObjectDetectorService(), server)
+    server.add_insecure_port('[::]:{}'.format(port))
+    server.start()
+    logger.info('Serving gRPC on port {}'.format(port))
+    return server
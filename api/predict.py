@@ -14,10 +14,27 @@
 # limitations under the License.
 #
 
+import time
 from maxfw.core import MAX_API, PredictAPI, CustomMAXAPI
-from flask_restx import fields
+from flask import Response, abort, request
+from flask_restx import fields, inputs, marshal
 from werkzeug.datastructures import FileStorage
 from core.model import ModelWrapper
+from core.boxes import parse_region_of_interest
+from core.fetch import ImageFetcher, FetchError
+from core.inputs import parse_image_shape, tensor_from_bytes, load_shared_tensor
+from core.memory import ImageTooLargeError, MemoryBudgetExceededError
+from core.formats import (JSON_MIMETYPE, COLUMNAR_JSON_MIMETYPE, MSGPACK_MIMETYPE, RESPONSE_MIMETYPES,
+                          to_columnar_json, to_msgpack)
+from core.scheduler import QueueFullError, DeadlineExceededError, deadline_after
+from config import TILE_SIZE, TILE_OVERLAP, INFERENCE_RETRY_AFTER, SHARED_INPUT_DIRS
+from config import (URL_FETCH_WORKERS, URL_FETCH_PER_HOST, URL_FETCH_MAX_BYTES, URL_FETCH_TIMEOUT, URL_FETCH_MAX_URLS,
+                    URL_FETCH_ALLOWED_HOSTS)
+
+DEADLINE_HEADER = 'X-Request-Deadline-Ms'
+PRIORITY_HEADER = 'X-Priority'
+API_KEY_HEADER = 'X-API-Key'
+FRAME_SKIPPED_HEADER = 'X-Frame-Skipped'
 
 model_label = MAX_API.model('ModelLabel', {
     'id': fields.String(required=True, description='Class label identifier'),
@@ -33,6 +50,8 @@ labels_response = MAX_API.model('LabelsResponse', {
 })
 
 model_wrapper = ModelWrapper()
+image_fetcher = ImageFetcher(URL_FETCH_WORKERS, URL_FETCH_PER_HOST, URL_FETCH_MAX_BYTES, URL_FETCH_TIMEOUT,
+                             URL_FETCH_ALLOWED_HOSTS)
 
 
 class ModelLabelsAPI(CustomMAXAPI):
@@ -48,12 +67,59 @@ class ModelLabelsAPI(CustomMAXAPI):
 
 
 input_parser = MAX_API.parser()
-input_parser.add_argument('image', type=FileStorage, location='files', required=True,
-                          help='An image file (encoded as PNG or JPG/JPEG)')
+input_parser.add_argument('image', type=FileStorage, location='files',
+                          help='An image file (encoded as PNG or JPG/JPEG). Exactly one of `image`, `image_url`, '
+                               '`tensor` and `image_path` is required.')
+input_parser.add_argument('image_url', type=str,
+                          help='URL of an image (encoded as PNG or JPG/JPEG) to download instead of uploading it')
+input_parser.add_argument('tensor', type=FileStorage, location='files',
+                          help='An already decoded RGB image as a uint8 tensor of shape (height, width, 3), either in '
+                               '.npy format or as raw pixels with `image_shape`')
+input_parser.add_argument('image_path', type=str,
+                          help='Path of a uint8 tensor file (.npy, or raw pixels with `image_shape`) inside one of the '
+                               'shared directories configured in SHARED_INPUT_DIRS, such as /dev/shm. The file is '
+                               'memory-mapped and fed to the model without decoding.')
+input_parser.add_argument('image_shape', type=parse_image_shape,
+                          help='Shape "height,width" of a raw uint8 tensor given with `tensor` or `image_path`')
 input_parser.add_argument('threshold', type=float, default=0.7,
                           help='Probability threshold for including a detected object in the response in the range '
                                '[0, 1] (default: 0.7). Lowering the threshold includes objects the model is less '
                                'certain about.')
+input_parser.add_argument('tiled', type=inputs.boolean, default=False,
+                          help='Split the image into overlapping tiles that are processed as a batch, so that small '
+                               'objects in very large images are not lost when the image is downscaled by the model '
+                               '(default: false)')
+input_parser.add_argument('tile_size', type=int, default=TILE_SIZE,
+                          help='Tile height and width in pixels when `tiled` is set (default: {})'.format(TILE_SIZE))
+input_parser.add_argument('tile_overlap', type=float, default=TILE_OVERLAP,
+                          help='Fraction of each tile shared with its neighbours when `tiled` is set, in the range '
+                               '[0, 0.9] (default: {})'.format(TILE_OVERLAP))
+input_parser.add_argument('roi', type=parse_region_of_interest, action='append',
+                          help='Region of interest to restrict detection to, given as normalized coordinates '
+                               '"ymin,xmin,ymax,xmax" (same convention as `detection_box`). May be repeated; all '
+                               'regions are cropped and processed as a batch, and returned boxes are normalized to '
+                               'the full image.')
+input_parser.add_argument('stream_id', type=str,
+                          help='Identifier of the camera stream the image is a frame of. A frame that is nearly '
+                               'identical to the last processed frame of its stream is answered with that frame\'s '
+                               'detections without running the model, which is reported in the `{}` response '
+                               'header.'.format(FRAME_SKIPPED_HEADER))
+input_parser.add_argument('deadline', type=int,
+                          help='Time budget for the request in milliseconds, counted from its arrival. Requests that '
+                               'cannot start inference within their budget fail with status 504 instead of being '
+                               'processed. Can also be set with the `{}` header.'.format(DEADLINE_HEADER))
+
+batch_parser = MAX_API.parser()
+batch_parser.add_argument('image_url', type=str, action='append', required=True,
+                          help='URL of an image (encoded as PNG or JPG/JPEG). Repeat for each image, up to {} per '
+                               'request; the images are downloaded concurrently and processed as a batch.'
+                               .format(URL_FETCH_MAX_URLS))
+batch_parser.add_argument('threshold', type=float, default=0.7,
+                          help='Probability threshold for including a detected object in the response in the range '
+                               '[0, 1] (default: 0.7)')
+batch_parser.add_argument('deadline', type=int,
+                          help='Time budget for the request in milliseconds, counted from its arrival. Can also be '
+                               'set with the `{}` header.'.format(DEADLINE_HEADER))
 
 
 label_prediction = MAX_API.model('LabelPrediction', {
@@ -74,22 +140,211 @@ predict_response = MAX_API.model('ModelPredictResponse', {
 })
 
 
+batch_result = MAX_API.model('BatchPredictResult', {
+    'image_url': fields.String(required=True, description='URL of the image'),
+    'status': fields.String(required=True, description='Status of this image'),
+    'message': fields.String(required=False, description='Reason the image could not be processed'),
+    'predictions': fields.List(fields.Nested(label_prediction),
+                               description='Predicted class labels, probabilities and bounding box for each detected '
+                                           'object')
+})
+
+batch_predict_response = MAX_API.model('ModelBatchPredictResponse', {
+    'status': fields.String(required=True, description='Response status message'),
+    'results': fields.List(fields.Nested(batch_result), description='Predictions for each image, in request order')
+})
+
+
+def request_deadline(args, arrival):
+    """Absolute deadline of a request from its `deadline` argument or header, if any"""
+    deadline_ms = args['deadline']
+    if deadline_ms is None and DEADLINE_HEADER in request.headers:
+        try:
+            deadline_ms = int(request.headers[DEADLINE_HEADER])
+        except ValueError:
+            abort(400, 'Invalid {} header'.format(DEADLINE_HEADER))
+    try:
+        return deadline_after(arrival, deadline_ms)
+    except ValueError as e:
+        abort(400, str(e))
+
+
+def request_lane():
+    """Inference queue lane of a request from its priority and API key headers"""
+    try:
+        return model_wrapper.queue.lane_for(request.headers.get(PRIORITY_HEADER), request.headers.get(API_KEY_HEADER))
+    except ValueError as e:
+        abort(400, str(e))
+
+
+def busy_response(result):
+    result['message'] = 'Server is busy, retry later'
+    return result, 503, {'Retry-After': str(INFERENCE_RETRY_AFTER)}
+
+
+def deadline_response(result):
+    result['message'] = 'Request deadline exceeded before inference could run'
+    return result, 504
+
+
+def read_input(args):
+    """Read the encoded image (uploaded or downloaded), or wrap an uploaded or shared uint8 tensor without decoding it"""
+    try:
+        if args['image_url'] is not None:
+            return image_fetcher.fetch(args['image_url'])
+        if args['image_path'] is not None:
+            return load_shared_tensor(args['image_path'], SHARED_INPUT_DIRS, args['image_shape'])
+        if args['tensor'] is not None:
+            return tensor_from_bytes(args['tensor'].read(), args['image_shape'])
+    except PermissionError as e:
+        abort(403, str(e))
+    except (ValueError, FetchError) as e:
+        abort(400, str(e))
+    return args['image'].read()
+
+
+def input_cost(image_input, tile_size=None, tile_overlap=TILE_OVERLAP, rois=None):
+    """Estimated memory of an input, checked against the pixel limit from the header of an encoded image
+    and against the limits on tiles and regions of interest"""
+    try:
+        return model_wrapper._input_cost(image_input, tile_size, tile_overlap, rois)
+    except ImageTooLargeError as e:
+        abort(413, str(e))
+    except ValueError as e:
+        abort(400, str(e))
+    except IOError:
+        abort(400, 'Unrecognized image format')
+
+
 class ModelPredictAPI(PredictAPI):
 
     @MAX_API.doc('predict')
     @MAX_API.expect(input_parser)
-    @MAX_API.marshal_with(predict_response)
+    @MAX_API.produces(RESPONSE_MIMETYPES)
+    @MAX_API.response(200, 'Success', predict_response)
     def post(self):
-        """Make a prediction given input data"""
+        """Make a prediction given input data
+
+        Requests are queued by priority class, selected with the `X-Priority` header (`interactive` by default,
+        or `bulk`), so that bulk traffic only uses the capacity left over by interactive requests.
+
+        The response format is negotiated with the Accept header: `application/json` (default),
+        `application/vnd.max.columnar+json` for parallel arrays of label ids, labels, probabilities and
+        flattened boxes, or `application/x-msgpack` for the same columns as binary buffers.
+        """
         result = {'status': 'error'}
+        arrival = time.monotonic()
 
         args = input_parser.parse_args()
+        deadline = request_deadline(args, arrival)
+        lane = request_lane()
+        if sum(args[name] is not None for name in ('image', 'image_url', 'tensor', 'image_path')) != 1:
+            abort(400, 'Exactly one of image, image_url, tensor and image_path is required')
         threshold = args['threshold']
-        image_data = args['image'].read()
-        image = model_wrapper._read_image(image_data)
-        label_preds = model_wrapper._predict(image, threshold)
+        tile_size = None
+        if args['tiled']:
+            if args['tile_size'] < 32:
+                abort(400, 'tile_size must be at least 32 pixels')
+            if not 0 <= args['tile_overlap'] <= 0.9:
+                abort(400, 'tile_overlap must be in the range [0, 0.9]')
+            tile_size = args['tile_size']
+        stream_id = args['stream_id']
+        params = (threshold, tile_size, args['tile_overlap'], repr(args['roi']))
+
+        skipped = False
+        try:
+            with model_wrapper.queue.admit(lane, deadline) as ticket:
+                image_input = read_input(args)
+                # reserve memory for the input before it is decoded
+                with model_wrapper.memory.reserve(input_cost(image_input, tile_size, args['tile_overlap'], args['roi']),
+                                                  deadline):
+                    image = model_wrapper._read_image(image_input) if isinstance(image_input, bytes) else image_input
+                    if stream_id is not None:
+                        detections, fingerprint = model_wrapper.stream_cache.lookup(stream_id, image, params)
+                        skipped = detections is not None
+                    if not skipped:
+                        with model_wrapper.queue.slot(ticket):
+                            detections = model_wrapper.pipeline.infer(model_wrapper._predict, image, threshold,
+                                                                      tile_size, args['tile_overlap'], args['roi'],
+                                                                      deadline).result()
+                        if stream_id is not None:
+                            model_wrapper.stream_cache.store(stream_id, fingerprint, params, detections)
+        except (QueueFullError, MemoryBudgetExceededError):
+            return busy_response(result)
+        except DeadlineExceededError:
+            return deadline_response(result)
+        headers = {FRAME_SKIPPED_HEADER: str(skipped).lower()} if stream_id is not None else {}
+
+        # machine clients can skip the per-detection marshaling below by asking for a columnar encoding
+        mimetype = request.accept_mimetypes.best_match(RESPONSE_MIMETYPES, default=JSON_MIMETYPE)
+        if mimetype == COLUMNAR_JSON_MIMETYPE:
+            labels = model_wrapper._label_names(detections['detection_classes'])
+            return Response(to_columnar_json(detections, labels), mimetype=mimetype, headers=headers)
+        if mimetype == MSGPACK_MIMETYPE:
+            labels = model_wrapper._label_names(detections['detection_classes'])
+            return Response(to_msgpack(detections, labels), mimetype=mimetype, headers=headers)
+
+        result['predictions'] = model_wrapper._post_process(detections)
+        result['status'] = 'ok'
+
+        return marshal(result, predict_response), 200, headers
+
+
+class ModelBatchPredictAPI(PredictAPI):
+
+    @MAX_API.doc('predict_batch')
+    @MAX_API.expect(batch_parser)
+    @MAX_API.response(200, 'Success', batch_predict_response)
+    def post(self):
+        """Make predictions for a batch of images given by URL
+
+        The images are downloaded concurrently by the server and processed together. Images that cannot be
+        downloaded or decoded are reported with an error status in their result.
+        """
+        result = {'status': 'error'}
+        arrival = time.monotonic()
+
+        args = batch_parser.parse_args()
+        deadline = request_deadline(args, arrival)
+        lane = request_lane()
+        urls = args['image_url']
+        if len(urls) > URL_FETCH_MAX_URLS:
+            abort(400, 'At most {} image URLs can be given per request'.format(URL_FETCH_MAX_URLS))
+
+        results = result['results'] = [{'image_url': url, 'status': 'error'} for url in urls]
+        try:
+            with model_wrapper.queue.admit(lane, deadline) as ticket:
+                images_data = image_fetcher.fetch_all(urls)
+                costs = {}
+                for i, image_data in enumerate(images_data):
+                    if isinstance(image_data, FetchError):
+                        results[i]['message'] = str(image_data)
+                        continue
+                    try:
+                        costs[i] = model_wrapper._input_cost(image_data)
+                    except ImageTooLargeError as e:
+                        results[i]['message'] = str(e)
+                    except IOError:
+                        results[i]['message'] = 'Unrecognized image format'
+                with model_wrapper.memory.reserve(sum(costs.values()), deadline):
+                    fetched, images = [], []
+                    for i, image in zip(costs, model_wrapper._read_images([images_data[i] for i in costs])):
+                        if isinstance(image, IOError):
+                            results[i]['message'] = 'Unrecognized image format'
+                        else:
+                            fetched.append(i)
+                            images.append(image)
+                    with model_wrapper.queue.slot(ticket):
+                        detections = model_wrapper.pipeline.infer(model_wrapper._predict_batch, images,
+                                                                  args['threshold'], deadline).result()
+        except (QueueFullError, MemoryBudgetExceededError):
+            return busy_response(result)
+        except DeadlineExceededError:
+            return deadline_response(result)
 
-        result['predictions'] = label_preds
+        for i, image_detections in zip(fetched, detections):
+            results[i]['predictions'] = model_wrapper._post_process(image_detections)
+            results[i]['status'] = 'ok'
         result['status'] = 'ok'
 
-        return result
+        return marshal(result, batch_predict_response)
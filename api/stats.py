@@ -0,0 +1,91 @@
+#
+# Copyright 2018-2021 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from maxfw.core import MAX_API, CustomMAXAPI
+from flask_restx import fields
+from .predict import model_wrapper
+
+lane_stats = MAX_API.model('PriorityLaneStats', {
+    'name': fields.String(required=True, description='Priority class'),
+    'weight': fields.Integer(required=True, description='Share of the inference slots given to this lane when other '
+                                                        'lanes have waiting requests'),
+    'max_depth': fields.Integer(required=True, description='Maximum number of queued requests'),
+    'queued': fields.Integer(required=True, description='Requests admitted and waiting for inference'),
+    'admitted': fields.Integer(required=True, description='Requests admitted since startup'),
+    'rejected': fields.Integer(required=True, description='Requests rejected with status 503 because the lane was '
+                                                          'full'),
+    'completed': fields.Integer(required=True, description='Requests that released their inference slot')
+})
+
+queue_stats = MAX_API.model('InferenceQueueStats', {
+    'queued': fields.Integer(required=True, description='Requests admitted and waiting for inference'),
+    'running': fields.Integer(required=True, description='Requests currently running inference'),
+    'concurrency': fields.Integer(required=True, description='Maximum number of requests running inference'),
+    'admitted': fields.Integer(required=True, description='Requests admitted since startup'),
+    'rejected': fields.Integer(required=True, description='Requests rejected with status 503 because their lane was '
+                                                          'full'),
+    'expired': fields.Integer(required=True, description='Requests dropped because their deadline passed'),
+    'completed': fields.Integer(required=True, description='Requests that released their inference slot'),
+    'lanes': fields.List(fields.Nested(lane_stats), description='Statistics for each priority lane')
+})
+
+stream_stats = MAX_API.model('StreamStats', {
+    'streams': fields.Integer(required=True, description='Camera streams whose last inferred frame is remembered'),
+    'frames': fields.Integer(required=True, description='Frames received with a `stream_id` since startup'),
+    'skipped': fields.Integer(required=True, description='Frames answered with the detections of an earlier, nearly '
+                                                         'identical frame without running the model'),
+    'inferred': fields.Integer(required=True, description='Frames that were run through the model')
+})
+
+stage_memory_stats = MAX_API.model('StageMemoryStats', {
+    'name': fields.String(required=True, description='Processing stage'),
+    'calls': fields.Integer(required=True, description='Times the stage ran since startup'),
+    'peak_rss_bytes': fields.Integer(required=True, description='Largest resident set size of the process at the '
+                                                                'end of the stage'),
+    'max_growth_bytes': fields.Integer(required=True, description='Largest growth of the resident set size during '
+                                                                  'one run of the stage')
+})
+
+memory_stats = MAX_API.model('MemoryStats', {
+    'budget_bytes': fields.Integer(description='Memory budget for the inputs of in-flight requests, if any'),
+    'reserved_bytes': fields.Integer(required=True, description='Memory currently reserved by in-flight requests'),
+    'peak_reserved_bytes': fields.Integer(required=True, description='Largest memory reserved at one time'),
+    'rejected': fields.Integer(required=True, description='Requests rejected with status 503 because the budget was '
+                                                          'in use'),
+    'rss_bytes': fields.Integer(description='Resident set size of the process'),
+    'peak_rss_bytes': fields.Integer(required=True, description='Peak resident set size of the process'),
+    'stages': fields.List(fields.Nested(stage_memory_stats), description='Resident memory around each stage of '
+                                                                         'request processing')
+})
+
+stats_response = MAX_API.model('ModelStatsResponse', {
+    'queue': fields.Nested(queue_stats, description='Inference queue statistics'),
+    'streams': fields.Nested(stream_stats, description='Frame skipping statistics for camera streams'),
+    'memory': fields.Nested(memory_stats, description='Memory budget and usage statistics')
+})
+
+
+class ModelStatsAPI(CustomMAXAPI):
+
+    @MAX_API.doc('stats')
+    @MAX_API.marshal_with(stats_response)
+    def get(self):
+        """Return serving statistics, such as the queue depth, rejected requests, skipped frames and memory use"""
+        return {
+            'queue': model_wrapper.queue.stats(),
+            'streams': model_wrapper.stream_cache.stats(),
+            'memory': model_wrapper.memory.stats()
+        }
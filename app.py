@@ -14,13 +14,24 @@
 # limitations under the License.
 #
 
-from maxfw.core import MAXApp
-from api import ModelMetadataAPI, ModelLabelsAPI, ModelPredictAPI
-from config import API_TITLE, API_DESC, API_VERSION
+# decode worker processes import this module too (as __mp_main__), so the API, which loads the model,
+# is only imported and served when it is run as a script
+if __name__ == '__main__':
+    from maxfw.core import MAXApp
+    from api import ModelMetadataAPI, ModelLabelsAPI, ModelPredictAPI, ModelBatchPredictAPI, ModelStatsAPI
+    from api.grpc_service import start_grpc_server
+    from config import API_TITLE, API_DESC, API_VERSION, GRPC_PORT, GRPC_WORKERS, GRPC_MAX_MESSAGE_BYTES
 
-max_app = MAXApp(API_TITLE, API_DESC, API_VERSION)
-max_app.add_api(ModelMetadataAPI, '/metadata')
-max_app.add_api(ModelLabelsAPI, '/labels')
-max_app.add_api(ModelPredictAPI, '/predict')
-max_app.mount_static('/app/')
-max_app.run()
+    max_app = MAXApp(API_TITLE, API_DESC, API_VERSION)
+    max_app.add_api(ModelMetadataAPI, '/metadata')
+    max_app.add_api(ModelLabelsAPI, '/labels')
+    max_app.add_api(ModelPredictAPI, '/predict')
+    max_app.add_api(ModelBatchPredictAPI, '/predict/batch')
+    max_app.add_api(ModelStatsAPI, '/stats')
+    max_app.mount_static('/app/')
+
+    # the gRPC server runs on its own threads and shares the model wrapper with the HTTP API
+    if GRPC_PORT:
+        grpc_server = start_grpc_server(GRPC_PORT, GRPC_WORKERS, GRPC_MAX_MESSAGE_BYTES)
+
+    max_app.run()
@@ -0,0 +1,292 @@
+#
+# Copyright 2018-2021 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Asyncio (ASGI) alternative to the Flask server in app.py.
+
+Uploads are read without tying a thread to each connection; decoding and inference are dispatched
+to the same executors and inference queue as in the Flask server. Run it with:
+
+    python asgi_app.py
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.datastructures import MultiDict
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+from config import TILE_SIZE, TILE_OVERLAP, INFERENCE_RETRY_AFTER, PRIORITY_LANES, SHARED_INPUT_DIRS
+from config import (URL_FETCH_WORKERS, URL_FETCH_PER_HOST, URL_FETCH_MAX_BYTES, URL_FETCH_TIMEOUT, URL_FETCH_MAX_URLS,
+                    URL_FETCH_ALLOWED_HOSTS)
+from core.boxes import parse_region_of_interest
+from core.formats import (JSON_MIMETYPE, COLUMNAR_JSON_MIMETYPE, MSGPACK_MIMETYPE, RESPONSE_MIMETYPES,
+                          to_label_predictions, to_columnar_json, to_msgpack)
+from core.fetch import ImageFetcher, FetchError
+from core.inputs import parse_image_shape, tensor_from_bytes, load_shared_tensor
+from core.memory import ImageTooLargeError, MemoryBudgetExceededError
+from core.model import ModelWrapper
+from core.scheduler import QueueFullError, DeadlineExceededError, deadline_after
+
+DEADLINE_HEADER = 'X-Request-Deadline-Ms'
+PRIORITY_HEADER = 'X-Priority'
+API_KEY_HEADER = 'X-API-Key'
+FRAME_SKIPPED_HEADER = 'X-Frame-Skipped'
+
+model_wrapper = ModelWrapper()
+image_fetcher = ImageFetcher(URL_FETCH_WORKERS, URL_FETCH_PER_HOST, URL_FETCH_MAX_BYTES, URL_FETCH_TIMEOUT,
+                             URL_FETCH_ALLOWED_HOSTS)
+
+# waiting for an inference slot blocks, so it happens on threads of its own rather than on the event loop; there is
+# one per request that can be queued, so that lane scheduling is not overridden by the order of an executor's queue
+slot_waiters = ThreadPoolExecutor(max_workers=sum(lane['max_depth'] for lane in PRIORITY_LANES.values()),
+                                  thread_name_prefix='slot')
+
+
+class BadRequest(Exception):
+    pass
+
+
+def error(status_code, message, headers=None):
+    return JSONResponse({'status': 'error', 'message': message}, status_code=status_code, headers=headers)
+
+
+def parse_boolean(value):
+    if value.lower() in ('true', '1', 'yes'):
+        return True
+    if value.lower() in ('false', '0', 'no'):
+        return False
+    raise ValueError('invalid boolean {}'.format(value))
+
+
+def parse_args(params, headers):
+    """Validate the /model/predict arguments, mirroring the Flask request parser"""
+    def get(name, convert, default=None):
+        if name not in params:
+            return default
+        try:
+            return convert(params[name])
+        except ValueError as e:
+            raise BadRequest('Invalid value for {}: {}'.format(name, e))
+
+    args = {
+        'threshold': get('threshold', float, 0.7),
+        'tile_size': None,
+        'tile_overlap': get('tile_overlap', float, TILE_OVERLAP),
+        'rois': None,
+        'deadline_ms': get('deadline', int, None),
+        'image_path': params.get('image_path'),
+        'image_url': params.get('image_url'),
+        'stream_id': params.get('stream_id'),
+        'image_shape': get('image_shape', parse_image_shape, None)
+    }
+    if 'roi' in params:
+        try:
+            args['rois'] = [parse_region_of_interest(value) for value in params.getlist('roi')]
+        except ValueError as e:
+            raise BadRequest('Invalid value for roi: {}'.format(e))
+    if get('tiled', parse_boolean, False):
+        args['tile_size'] = get('tile_size', int, TILE_SIZE)
+        if args['tile_size'] < 32:
+            raise BadRequest('tile_size must be at least 32 pixels')
+        if not 0 <= args['tile_overlap'] <= 0.9:
+            raise BadRequest('tile_overlap must be in the range [0, 0.9]')
+    if args['deadline_ms'] is None and DEADLINE_HEADER in headers:
+        try:
+            args['deadline_ms'] = int(headers[DEADLINE_HEADER])
+        except ValueError:
+            raise BadRequest('Invalid {} header'.format(DEADLINE_HEADER))
+    return args
+
+
+async def read_input(uploads, args):
+    """Read the encoded image (uploaded or downloaded), or wrap an uploaded or shared uint8 tensor without decoding it"""
+    if args['image_url'] is not None:
+        return await asyncio.wrap_future(image_fetcher.executor.submit(image_fetcher.fetch, args['image_url']))
+    if args['image_path'] is not None:
+        return load_shared_tensor(args['image_path'], SHARED_INPUT_DIRS, args['image_shape'])
+    if 'tensor' in uploads:
+        return tensor_from_bytes(await uploads['tensor'].read(), args['image_shape'])
+    return await uploads['image'].read()
+
+
+def run_in_slot(ticket, image, args, deadline):
+    with model_wrapper.queue.slot(ticket):
+        return model_wrapper.pipeline.infer(model_wrapper._predict, image, args['threshold'], args['tile_size'],
+                                            args['tile_overlap'], args['rois'], deadline).result()
+
+
+async def predict(request):
+    arrival = time.monotonic()
+    loop = asyncio.get_event_loop()
+
+    form = await request.form()
+    params = MultiDict(request.query_params.multi_items() +
+                       [(key, value) for key, value in form.multi_items() if isinstance(value, str)])
+    uploads = {name: form.get(name) for name in ('image', 'tensor') if not isinstance(form.get(name, ''), str)}
+    try:
+        args = parse_args(params, request.headers)
+        if len(uploads) + (args['image_path'] is not None) + (args['image_url'] is not None) != 1:
+            raise BadRequest('Exactly one of image, image_url, tensor and image_path is required')
+        lane = model_wrapper.queue.lane_for(request.headers.get(PRIORITY_HEADER), request.headers.get(API_KEY_HEADER))
+        deadline = deadline_after(arrival, args['deadline_ms'])
+    except (BadRequest, ValueError) as e:
+        return error(400, str(e))
+    stream_id = args['stream_id']
+    params = (args['threshold'], args['tile_size'], args['tile_overlap'], repr(args['rois']))
+
+    try:
+        with model_wrapper.queue.admit(lane, deadline) as ticket:
+            try:
+                image_input = await read_input(uploads, args)
+                cost = model_wrapper._input_cost(image_input, args['tile_size'], args['tile_overlap'], args['rois'])
+            except PermissionError as e:
+                return error(403, str(e))
+            except ImageTooLargeError as e:
+                return error(413, str(e))
+            except (ValueError, FetchError) as e:
+                return error(400, str(e))
+            except IOError:
+                return error(400, 'Unrecognized image format')
+            # reserve memory for the input before it is decoded
+            await loop.run_in_executor(slot_waiters, model_wrapper.memory.acquire, cost, deadline)
+            try:
+                image = image_input
+                if isinstance(image_input, bytes):
+                    image, = await loop.run_in_executor(slot_waiters, model_wrapper._read_images, [image_input])
+                    if isinstance(image, IOError):
+                        return error(400, 'Unrecognized image format')
+                skipped = False
+                if stream_id is not None:
+                    detections, fingerprint = await loop.run_in_executor(None, model_wrapper.stream_cache.lookup,
+                                                                         stream_id, image, params)
+                    skipped = detections is not None
+                if not skipped:
+                    detections = await loop.run_in_executor(slot_waiters, run_in_slot, ticket, image, args, deadline)
+                    if stream_id is not None:
+                        model_wrapper.stream_cache.store(stream_id, fingerprint, params, detections)
+            finally:
+                model_wrapper.memory.release(cost)
+    except (QueueFullError, MemoryBudgetExceededError):
+        return error(503, 'Server is busy, retry later', {'Retry-After': str(INFERENCE_RETRY_AFTER)})
+    except DeadlineExceededError:
+        return error(504, 'Request deadline exceeded before inference could run')
+    headers = {FRAME_SKIPPED_HEADER: str(skipped).lower()} if stream_id is not None else None
+
+    labels = model_wrapper._label_names(detections['detection_classes'])
+    mimetype = parse_accept_header(request.headers.get('accept'), MIMEAccept).best_match(RESPONSE_MIMETYPES,
+                                                                                         default=JSON_MIMETYPE)
+    if mimetype == COLUMNAR_JSON_MIMETYPE:
+        return Response(to_columnar_json(detections, labels), media_type=mimetype, headers=headers)
+    if mimetype == MSGPACK_MIMETYPE:
+        return Response(to_msgpack(detections, labels), media_type=mimetype, headers=headers)
+    return JSONResponse({'status': 'ok', 'predictions': to_label_predictions(detections, labels)}, headers=headers)
+
+
+def run_batch_in_slot(ticket, images_data, results, threshold, deadline):
+    """Reserve memory for the downloaded images, decode them and run them through the model as a batch"""
+    costs = {}
+    for i, image_data in enumerate(images_data):
+        if isinstance(image_data, FetchError):
+            results[i]['message'] = str(image_data)
+            continue
+        try:
+            costs[i] = model_wrapper._input_cost(image_data)
+        except ImageTooLargeError as e:
+            results[i]['message'] = str(e)
+        except IOError:
+            results[i]['message'] = 'Unrecognized image format'
+    with model_wrapper.memory.reserve(sum(costs.values()), deadline):
+        fetched, images = [], []
+        for i, image in zip(costs, model_wrapper._read_images([images_data[i] for i in costs])):
+            if isinstance(image, IOError):
+                results[i]['message'] = 'Unrecognized image format'
+            else:
+                fetched.append(i)
+                images.append(image)
+        with model_wrapper.queue.slot(ticket):
+            detections = model_wrapper.pipeline.infer(model_wrapper._predict_batch, images, threshold,
+                                                      deadline).result()
+    return list(zip(fetched, detections))
+
+
+async def predict_batch(request):
+    arrival = time.monotonic()
+    loop = asyncio.get_event_loop()
+
+    form = await request.form()
+    params = MultiDict(request.query_params.multi_items() +
+                       [(key, value) for key, value in form.multi_items() if isinstance(value, str)])
+    urls = params.getlist('image_url')
+    try:
+        args = parse_args(params, request.headers)
+        if not urls or len(urls) > URL_FETCH_MAX_URLS:
+            raise BadRequest('Between 1 and {} image URLs are required'.format(URL_FETCH_MAX_URLS))
+        lane = model_wrapper.queue.lane_for(request.headers.get(PRIORITY_HEADER), request.headers.get(API_KEY_HEADER))
+        deadline = deadline_after(arrival, args['deadline_ms'])
+    except (BadRequest, ValueError) as e:
+        return error(400, str(e))
+
+    results = [{'image_url': url, 'status': 'error'} for url in urls]
+    try:
+        with model_wrapper.queue.admit(lane, deadline) as ticket:
+            images_data = await loop.run_in_executor(slot_waiters, image_fetcher.fetch_all, urls)
+            detections = await loop.run_in_executor(slot_waiters, run_batch_in_slot, ticket, images_data, results,
+                                                    args['threshold'], deadline)
+    except (QueueFullError, MemoryBudgetExceededError):
+        return error(503, 'Server is busy, retry later', {'Retry-After': str(INFERENCE_RETRY_AFTER)})
+    except DeadlineExceededError:
+        return error(504, 'Request deadline exceeded before inference could run')
+
+    for i, image_detections in detections:
+        labels = model_wrapper._label_names(image_detections['detection_classes'])
+        results[i]['predictions'] = to_label_predictions(image_detections, labels)
+        results[i]['status'] = 'ok'
+    return JSONResponse({'status': 'ok', 'results': results})
+
+
+async def labels(request):
+    return JSONResponse({
+        'labels': [{'id': str(category['id']), 'name': category['name']} for category in model_wrapper.categories],
+        'count': len(model_wrapper.categories)
+    })
+
+
+async def metadata(request):
+    return JSONResponse(ModelWrapper.MODEL_META_DATA)
+
+
+async def stats(request):
+    return JSONResponse({'queue': model_wrapper.queue.stats(), 'streams': model_wrapper.stream_cache.stats(),
+                         'memory': model_wrapper.memory.stats()})
+
+
+app = Starlette(routes=[
+    Route('/model/predict', predict, methods=['POST']),
+    Route('/model/predict/batch', predict_batch, methods=['POST']),
+    Route('/model/labels', labels, methods=['GET']),
+    Route('/model/metadata', metadata, methods=['GET']),
+    Route('/model/stats', stats, methods=['GET'])
+])
+
+
+if __name__ == '__main__':
+    uvicorn.run(app, host='0.0.0.0', port=5000)  # nosec - binding to all interfaces
@@ -0,0 +1,111 @@
+#
+# Copyright 2018-2021 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Connections-per-replica comparison of the Flask (app.py) and asyncio (asgi_app.py) servers.
+
+Opens an increasing number of concurrent connections that upload an image slowly, as mobile clients
+on poor networks do, and checks whether a probe request to /model/metadata is still served quickly
+while they are in flight. Start either server, then run for example:
+
+    python -m benchmarks.connections --url http://localhost:5000 --connections 16 64 256 1024
+"""
+
+import argparse
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+BOUNDARY = 'max-object-detector-benchmark'
+
+
+def multipart_body(image):
+    head = ('--{}\r\nContent-Disposition: form-data; name="image"; filename="image.jpg"\r\n'
+            'Content-Type: image/jpeg\r\n\r\n').format(BOUNDARY).encode()
+    return head + image + '\r\n--{}--\r\n'.format(BOUNDARY).encode()
+
+
+async def read_status(reader):
+    status_line = await reader.readline()
+    return int(status_line.split()[1])
+
+
+async def slow_upload(host, port, body, duration, chunks=20):
+    """POST `body` to /model/predict in chunks spread over `duration` seconds and return the status code."""
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        return None
+    try:
+        writer.write(('POST /model/predict HTTP/1.1\r\nHost: {}\r\nConnection: close\r\n'
+                      'Content-Type: multipart/form-data; boundary={}\r\nContent-Length: {}\r\n\r\n')
+                     .format(host, BOUNDARY, len(body)).encode())
+        size = -(-len(body) // chunks)
+        for start in range(0, len(body), size):
+            writer.write(body[start:start + size])
+            await writer.drain()
+            await asyncio.sleep(duration / chunks)
+        return await read_status(reader)
+    except (OSError, IndexError, ValueError):
+        return None
+    finally:
+        writer.close()
+
+
+async def probe(host, port, timeout):
+    """Return the latency of GET /model/metadata, or None if it is not answered within `timeout` seconds."""
+    start = time.monotonic()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        writer.write('GET /model/metadata HTTP/1.1\r\nHost: {}\r\nConnection: close\r\n\r\n'.format(host).encode())
+        status = await asyncio.wait_for(read_status(reader), timeout - (time.monotonic() - start))
+        writer.close()
+    except (OSError, IndexError, ValueError, asyncio.TimeoutError):
+        return None
+    return time.monotonic() - start if status == 200 else None
+
+
+async def run(host, port, connections, duration, body):
+    uploads = [asyncio.ensure_future(slow_upload(host, port, body, duration)) for _ in range(connections)]
+    await asyncio.sleep(duration / 2)
+    latency = await probe(host, port, duration)
+    statuses = await asyncio.gather(*uploads)
+    return latency, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000', help='Base URL of the model server')
+    parser.add_argument('--connections', type=int, nargs='+', default=[16, 64, 256, 1024],
+                        help='Numbers of concurrent slow uploads to test')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds each slow upload takes')
+    parser.add_argument('--image', default='samples/dog-human.jpg', help='Image to upload')
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    with open(args.image, 'rb') as f:
+        body = multipart_body(f.read())
+
+    print('{:>12} {:>8} {:>8} {:>8} {:>16}'.format('connections', 'ok', '503', 'failed', 'probe latency'))
+    for connections in args.connections:
+        latency, statuses = asyncio.run(run(url.hostname, url.port or 80, connections, args.duration, body))
+        print('{:>12} {:>8} {:>8} {:>8} {:>16}'.format(
+            connections, statuses.count(200), statuses.count(503),
+            sum(status not in (200, 503) for status in statuses),
+            'timeout' if latency is None else '{:.3f} s'.format(latency)))
+
+
+if __name__ == '__main__':
+    main()
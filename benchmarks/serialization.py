@@ -0,0 +1,73 @@
+#
+# Copyright 2018-2021 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Serialization cost of the /model/predict response formats versus the number of detections.
+
+Run from the repository root inside the model container (the model is loaded so that the real
+response schema and label lookup are measured):
+
+    python -m benchmarks.serialization
+"""
+
+import json
+import timeit
+
+import numpy as np
+from flask_restx import marshal
+
+from api.predict import model_wrapper, predict_response
+from core.formats import to_columnar_json, to_msgpack
+
+DETECTION_COUNTS = [1, 10, 100, 1000, 10000]
+
+
+def make_detections(count, seed=0):
+    rng = np.random.default_rng(seed)
+    label_ids = np.array(sorted(model_wrapper.category_index), dtype=np.int32)
+    corners = rng.random((count, 2, 2), dtype=np.float32)
+    return {
+        'detection_boxes': np.concatenate([corners.min(axis=1), corners.max(axis=1)], axis=1),
+        'detection_scores': rng.random(count, dtype=np.float32),
+        'detection_classes': rng.choice(label_ids, count)
+    }
+
+
+def encode_json(detections):
+    result = {'status': 'ok', 'predictions': model_wrapper._post_process(detections)}
+    return json.dumps(marshal(result, predict_response))
+
+
+def encode_columnar(detections):
+    return to_columnar_json(detections, model_wrapper._label_names(detections['detection_classes']))
+
+
+def encode_msgpack(detections):
+    return to_msgpack(detections, model_wrapper._label_names(detections['detection_classes']))
+
+
+def main():
+    encoders = [('json', encode_json), ('columnar', encode_columnar), ('msgpack', encode_msgpack)]
+    print('{:>10} {:>10} {:>14} {:>12}'.format('detections', 'format', 'time (us)', 'size (B)'))
+    for count in DETECTION_COUNTS:
+        detections = make_detections(count)
+        for name, encode in encoders:
+            number = max(1, 10000 // count)
+            seconds = min(timeit.repeat(lambda: encode(detections), number=number, repeat=5)) / number
+            print('{:>10} {:>10} {:>14.1f} {:>12}'.format(count, name, seconds * 1e6, len(encode(detections))))
+
+
+if __name__ == '__main__':
+    main()
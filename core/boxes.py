@@ -0,0 +1,136 @@
+#
+# Copyright 2018-2021 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import numpy as np
+
+
+def tile_windows(height, width, tile_size, overlap, max_tiles=None):
+    """Return the overlapping tile windows covering an image as pixel [ymin, xmin, ymax, xmax] rows.
+
+    All tiles have the same shape so they can be stacked into a single batch; the last tile along
+    each axis is shifted back to end on the image border instead of being truncated. Raises
+    ValueError, before any window is built, when more than `max_tiles` tiles would be needed.
+    """
+    def starts(length):
+        if length <= tile_size:
+            return [], length
+        stride = max(1, int(round(tile_size * (1 - overlap))))
+        return range(0, length - tile_size, stride), tile_size
+
+    ys, tile_h = starts(height)
+    xs, tile_w = starts(width)
+    # the position ranges are lazy, so an absurd tiling is rejected without being enumerated
+    if max_tiles is not None and (len(ys) + 1) * (len(xs) + 1) > max_tiles:
+        raise ValueError('The image would be split into more than {} tiles; use a larger tile_size or a smaller '
+                         'tile_overlap'.format(max_tiles))
+    ys = list(ys) + [height - tile_h]
+    xs = list(xs) + [width - tile_w]
+    return np.array([[y, x, y + tile_h, x + tile_w] for y in ys for x in xs], dtype=np.int64)
+
+
+def fit_within(height, width, max_side):
+    """Shape of a (height, width) window scaled down, keeping its aspect ratio, to at most `max_side` per side."""
+    scale = min(1.0, max_side / max(height, width))
+    return max(1, int(round(height * scale))), max(1, int(round(width * scale)))
+
+
+def windows_to_image(boxes, windows, height, width):
+    """Map boxes normalized to their window back to coordinates normalized to the full image.
+
+    `boxes` has shape (N, K, 4) and `windows` (N, 4), both in [ymin, xmin, ymax, xmax] order.
+    """
+    windows = np.asarray(windows, dtype=np.float32)
+    origin = windows[:, None, [0, 1, 0, 1]]
+    extent = (windows[:, [2, 3]] - windows[:, [0, 1]])[:, None, [0, 1, 0, 1]]
+    scale = np.array([height, width, height, width], dtype=np.float32)
+    return (origin + boxes * extent) / scale
+
+
+def _iou(boxes_a, boxes_b):
+    """Pairwise IoU matrix of two sets of [ymin, xmin, ymax, xmax] boxes."""
+    height = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    height -= np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    width = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    width -= np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    intersection = np.clip(height, 0, None, out=height)
+    intersection *= np.clip(width, 0, None, out=width)
+    areas_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    areas_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = areas_a[:, None] + areas_b[None, :]
+    union -= intersection
+    return intersection / np.maximum(union, 1e-12, out=union)
+
+
+def non_max_suppression(boxes, scores, classes, iou_threshold, block_size=256):
+    """Greedy per-class non-maximum suppression, returning the indices of the boxes to keep by descending score.
+
+    Each class is suppressed separately. Its candidates are visited by descending score in blocks of
+    `block_size`: the greedy pass runs inside a block, and the boxes kept in a block then suppress all
+    later candidates at once. Memory grows linearly with the number of boxes.
+    """
+    keep = []
+    for label in np.unique(classes):
+        indices = np.flatnonzero(classes == label)
+        indices = indices[np.argsort(-scores[indices], kind='stable')]
+        candidates = boxes[indices].astype(np.float64)
+        alive = np.ones(len(indices), dtype=bool)
+        for start in range(0, len(indices), block_size):
+            block = np.arange(start, min(start + block_size, len(indices)))
+            block = block[alive[block]]
+            iou = _iou(candidates[block], candidates[block])
+            suppressed = np.zeros(len(block), dtype=bool)
+            for j in range(len(block)):
+                if not suppressed[j]:
+                    suppressed[j + 1:] |= iou[j, j + 1:] > iou_threshold
+            kept = block[~suppressed]
+            keep.extend(indices[kept])
+            # compare with about a million later candidates at a time to bound the temporary arrays
+            chunk_size = max(block_size, (1 << 20) // max(1, len(kept)))
+            for later in range(start + block_size, len(indices), chunk_size):
+                rest = np.arange(later, min(later + chunk_size, len(indices)))
+                rest = rest[alive[rest]]
+                if rest.size:
+                    alive[rest[(_iou(candidates[kept], candidates[rest]) > iou_threshold).any(axis=0)]] = False
+    keep = np.array(keep, dtype=np.int64)
+    return keep[np.argsort(-scores[keep], kind='stable')]
+
+
+def normalized_to_windows(boxes, height, width):
+    """Convert normalized [ymin, xmin, ymax, xmax] boxes to integer pixel windows of at least one pixel."""
+    boxes = np.clip(np.asarray(boxes, dtype=np.float64).reshape(-1, 4), 0, 1)
+    scale = np.array([height, width, height, width])
+    windows = np.empty(boxes.shape, dtype=np.int64)
+    windows[:, :2] = np.floor(boxes[:, :2] * scale[:2])
+    windows[:, 2:] = np.ceil(boxes[:, 2:] * scale[2:])
+    windows[:, :2] = np.minimum(windows[:, :2], scale[:2] - 1)
+    windows[:, 2:] = np.maximum(windows[:, 2:], windows[:, :2] + 1)
+    return windows
+
+
+def check_region_of_interest(ymin, xmin, ymax, xmax):
+    """Validate normalized region coordinates, returning them as a [ymin, xmin, ymax, xmax] list"""
+    if not (0 <= ymin < ymax <= 1 and 0 <= xmin < xmax <= 1):
+        raise ValueError('coordinates must satisfy 0 <= min < max <= 1')
+    return [ymin, xmin, ymax, xmax]
+
+
+def parse_region_of_interest(value):
+    """Parse a "ymin,xmin,ymax,xmax" string of normalized coordinates"""
+    try:
+        ymin, xmin, ymax, xmax = (float(v) for v in value.split(','))
+    except ValueError:
+        raise ValueError('expected four comma-separated numbers')
+    return check_region_of_interest(ymin, xmin, ymax, xmax)
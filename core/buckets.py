@@ -0,0 +1,97 @@
+#
+# Copyright 2018-2021 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from PIL import Image
+
+from core.memory import batch_size_for
+
+
+class ShapeBuckets(object):
+    """Fits images of arbitrary size into a small set of fixed input shapes.
+
+    Feeding the model a handful of shapes lets TensorFlow reuse its intermediate buffers, and lets
+    images of different sizes that fall into the same bucket share a batch. The uint8 input buffers
+    of each bucket are preallocated and recycled, so steady-state memory stays flat.
+
+    In `letterbox` mode an image keeps its aspect ratio: it is only scaled down when it is larger
+    than the largest bucket, and is padded with black at the bottom and right. In `resize` mode it is
+    stretched to fill the bucket. Buffers hold up to `batch_size` images, and no more than
+    `max_batch_pixels` pixels when it is set.
+    """
+
+    def __init__(self, shapes, mode, batch_size, max_batch_pixels=None):
+        if mode not in ('letterbox', 'resize'):
+            raise ValueError('Unknown shape bucket mode {}'.format(mode))
+        self.shapes = sorted((tuple(shape) for shape in shapes), key=lambda shape: shape[0] * shape[1])
+        self.mode = mode
+        self.batch_sizes = {shape: batch_size_for(shape[0], shape[1], batch_size, max_batch_pixels)
+                            for shape in self.shapes}
+        self._free = {shape: [] for shape in self.shapes}
+        self._lock = threading.Lock()
+
+    def select(self, height, width):
+        """Return the smallest bucket that holds an image without scaling, or the largest one."""
+        for shape in self.shapes:
+            if height <= shape[0] and width <= shape[1]:
+                return shape
+        return self.shapes[-1]
+
+    def content_shape(self, bucket, height, width):
+        """Shape an image of the given size occupies inside a bucket."""
+        if self.mode == 'resize':
+            return bucket
+        scale = min(1.0, bucket[0] / height, bucket[1] / width)
+        return max(1, int(height * scale)), max(1, int(width * scale))
+
+    @contextmanager
+    def buffer(self, bucket):
+        """Borrow a preallocated (batch_sizes[bucket], height, width, 3) uint8 buffer for a bucket."""
+        with self._lock:
+            free = self._free[bucket]
+            buffer = free.pop() if free else np.zeros((self.batch_sizes[bucket],) + bucket + (3,), dtype=np.uint8)
+        try:
+            yield buffer
+        finally:
+            with self._lock:
+                self._free[bucket].append(buffer)
+
+    def fill(self, buffer, index, bucket, image):
+        """Copy an image into slot `index` of a bucket buffer and return the (height, width) it occupies."""
+        content_h, content_w = self.content_shape(bucket, *image.shape[:2])
+        if (content_h, content_w) != image.shape[:2]:
+            image = np.asarray(Image.fromarray(image).resize((content_w, content_h), Image.BILINEAR))
+        buffer[index, :content_h, :content_w] = image
+        buffer[index, content_h:] = 0
+        buffer[index, :content_h, content_w:] = 0
+        return content_h, content_w
+
+
+def bucket_to_image(boxes, scores, bucket, content_shapes):
+    """Map boxes normalized to a bucket back to coordinates normalized to the images placed in it.
+
+    `boxes` has shape (N, K, 4), `scores` (N, K) and `content_shapes` (N, 2) holds the (height, width)
+    each image occupies inside the bucket. Returns the mapped boxes and the scores, with the scores of
+    detections lying entirely in the letterbox padding, whose boxes are clipped to nothing, set to 0.
+    """
+    content_shapes = np.asarray(content_shapes, dtype=np.float32)
+    scale = (np.array(bucket, dtype=np.float32) / content_shapes)[:, None, [0, 1, 0, 1]]
+    boxes = np.clip(boxes * scale, 0, 1)
+    empty = (boxes[..., 2] <= boxes[..., 0]) | (boxes[..., 3] <= boxes[..., 1])
+    return boxes, np.where(empty, 0, scores).astype(scores.dtype)
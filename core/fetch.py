@@ -0,0 +1,283 @@
+#
+# Copyright 2018-2021 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import ipaddress
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+logger = logging.getLogger()
+
+# most redirects followed for one image
+MAX_REDIRECTS = 5
+
+# the watchdog of the download running on each fetch thread
+_watched = threading.local()
+
+
+class FetchError(Exception):
+    """Raised when an image cannot be downloaded from its URL."""
+
+
+def is_public_address(address):
+    """Whether an IP address is globally routable, rather than private, loopback, link-local or reserved."""
+    address = ipaddress.ip_address(address.split('%')[0])
+    if address.version == 6 and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    return address.is_global and not address.is_multicast
+
+
+class Watchdog(object):
+    """Shuts down the connection of a download that is still running after `timeout` seconds.
+
+    Socket timeouts only bound each read, so a server that sends a byte at a time could otherwise keep
+    a download going for as long as it likes. While the watchdog is entered, the connections used by
+    the current thread report their socket to it.
+    """
+
+    def __init__(self, timeout):
+        self.fired = False
+        self._sock = None
+        self._lock = threading.Lock()
+        self._timer = threading.Timer(timeout, self._fire)
+        self._timer.daemon = True
+
+    def __enter__(self):
+        _watched.watchdog = self
+        self._timer.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        _watched.watchdog = None
+        self._timer.cancel()
+        with self._lock:
+            self._sock = None
+
+    def watch(self, sock):
+        with self._lock:
+            self._sock = sock
+            if self.fired:
+                self._shutdown()
+
+    def _fire(self):
+        with self._lock:
+            self.fired = True
+            self._shutdown()
+
+    def _shutdown(self):
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def _watch(sock):
+    watchdog = getattr(_watched, 'watchdog', None)
+    if watchdog is not None and sock is not None:
+        watchdog.watch(sock)
+
+
+def _checked_connection(connection_cls, address_allowed):
+    """Subclass of a urllib3 connection class that refuses to talk to addresses that are not allowed.
+
+    The address is checked on the connected socket, before anything is sent, so a DNS answer that
+    changes between a check and the connection cannot bypass it. The socket of every request is
+    also handed to the watchdog of the download, if any.
+    """
+    class CheckedConnection(connection_cls):
+        def _new_conn(self):
+            sock = super()._new_conn()
+            if not address_allowed(self.host, sock.getpeername()[0]):
+                sock.close()
+                raise NewConnectionError(self, 'Connections to this address are not allowed')
+            _watch(sock)
+            return sock
+
+        def request(self, *args, **kwargs):
+            _watch(self.sock)
+            return super().request(*args, **kwargs)
+    return CheckedConnection
+
+
+class HostSlot(object):
+    """Limits the concurrent downloads from one host; `users` counts the downloads holding or waiting for it."""
+
+    def __init__(self, per_host):
+        self.semaphore = threading.BoundedSemaphore(per_host)
+        self.users = 0
+
+
+class CheckedAdapter(HTTPAdapter):
+    """HTTP adapter whose connections are restricted by an `address_allowed(host, address)` callable."""
+
+    def __init__(self, address_allowed, **kwargs):
+        self.address_allowed = address_allowed
+        super(CheckedAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(CheckedAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: type(pool_cls.__name__, (pool_cls,),
+                         {'ConnectionCls': _checked_connection(pool_cls.ConnectionCls, self.address_allowed)})
+            for scheme, pool_cls in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
+
+class ImageFetcher(object):
+    """Downloads images by URL with a pooled keep-alive HTTP client.
+
+    Downloads run concurrently on `workers` threads with at most `per_host` requests in flight to
+    any one host. Each download, including waiting for its host and following up to MAX_REDIRECTS
+    redirects, is limited to `max_bytes` and must complete within `timeout` seconds. When
+    `allowed_hosts` is not empty, only those hosts may be contacted. Private, loopback, link-local
+    and reserved addresses are only contacted for hosts listed in `allowed_hosts`.
+
+    Failures after the URL has been validated are reported with the same message, so that clients
+    cannot use the service to probe which hosts and ports answer; the reason is logged.
+    """
+
+    def __init__(self, workers, per_host, max_bytes, timeout, allowed_hosts=None):
+        self.per_host = per_host
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.allowed_hosts = set(allowed_hosts or [])
+        self.session = requests.Session()
+        adapter = CheckedAdapter(self._address_allowed, pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fetch')
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def _address_allowed(self, host, address):
+        return host in self.allowed_hosts or is_public_address(address)
+
+    def _acquire_host(self, host, timeout):
+        """Wait up to `timeout` seconds for a download slot of a host, returning whether one was acquired."""
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = HostSlot(self.per_host)
+            slot.users += 1
+        if slot.semaphore.acquire(timeout=timeout):
+            return True
+        self._leave_host(host, slot)
+        return False
+
+    def _release_host(self, host):
+        slot = self._host_slots[host]
+        slot.semaphore.release()
+        self._leave_host(host, slot)
+
+    def _leave_host(self, host, slot):
+        # forget idle hosts, so that clients naming ever new hosts do not grow the table
+        with self._lock:
+            slot.users -= 1
+            if not slot.users:
+                del self._host_slots[host]
+
+    def _check_url(self, url):
+        """Return the host of a URL that may be fetched, raising FetchError otherwise."""
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise FetchError('Unsupported URL {}'.format(url))
+        if self.allowed_hosts and parts.hostname not in self.allowed_hosts:
+            raise FetchError('Host {} is not allowed'.format(parts.hostname))
+        return parts.hostname
+
+    def fetch(self, url):
+        """Download the body of `url`, raising FetchError if it cannot be retrieved within the limits."""
+        deadline = time.monotonic() + self.timeout
+        location = url
+        for _ in range(MAX_REDIRECTS + 1):
+            host = self._check_url(location)
+            if not self._acquire_host(host, max(0, deadline - time.monotonic())):
+                raise self._failed(url, 'timed out waiting for a connection to {}'.format(host))
+            try:
+                body, location = self._download(url, location, deadline)
+            finally:
+                self._release_host(host)
+            if body is not None:
+                return body
+        raise self._failed(url, 'too many redirects')
+
+    def _download(self, url, location, deadline):
+        """Download one hop of `url`, returning its body or the absolute location it redirects to."""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise self._failed(url, 'timed out')
+        response = None
+        try:
+            # the watchdog is stopped before the connection is released to the pool
+            with Watchdog(remaining) as watchdog:
+                response = self.session.get(location, stream=True, allow_redirects=False,
+                                            timeout=(min(remaining, 3.05), remaining))
+                result = self._read(url, location, response)
+        except requests.RequestException as e:
+            raise self._failed(url, 'timed out' if watchdog.fired else '{}: {}'.format(type(e).__name__, e))
+        finally:
+            if response is not None:
+                response.close()
+        # a connection shut down by the watchdog can look like the end of a body without a length
+        if watchdog.fired:
+            raise self._failed(url, 'timed out')
+        return result
+
+    def _read(self, url, location, response):
+        if response.is_redirect:
+            return None, urljoin(location, response.headers['Location'])
+        if response.status_code != 200:
+            raise self._failed(url, 'status {}'.format(response.status_code))
+        try:
+            length = int(response.headers.get('Content-Length', 0))
+        except ValueError:
+            length = 0
+        if length > self.max_bytes:
+            raise self._failed(url, 'Content-Length {} exceeds {} bytes'.format(length, self.max_bytes))
+        chunks, size = [], 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            size += len(chunk)
+            if size > self.max_bytes:
+                raise self._failed(url, 'body exceeds {} bytes'.format(self.max_bytes))
+            chunks.append(chunk)
+        return b''.join(chunks), None
+
+    @staticmethod
+    def _failed(url, reason):
+        logger.info('Fetching %s failed: %s', url, reason)
+        return FetchError('The image at {} could not be fetched'.format(url))
+
+    def fetch_all(self, urls):
+        """Fetch several images concurrently.
+
+        Returns, in input order, the downloaded bytes or a FetchError for each URL.
+        """
+        futures = [self.executor.submit(self.fetch, url) for url in urls]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except FetchError as e:
+                results.append(e)
+        return results
@@ -0,0 +1,73 @@
+#
+# Copyright 2018-2021 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Compact encodings of detection results for high-throughput machine clients.
+
+The default JSON response marshals one object per detection. The encodings below are built directly
+from the detection arrays instead: a columnar JSON document with parallel arrays, and a MessagePack
+document carrying the same columns as little-endian binary buffers.
+"""
+
+import json
+
+import msgpack
+
+JSON_MIMETYPE = 'application/json'
+COLUMNAR_JSON_MIMETYPE = 'application/vnd.max.columnar+json'
+MSGPACK_MIMETYPE = 'application/x-msgpack'
+
+RESPONSE_MIMETYPES = [JSON_MIMETYPE, COLUMNAR_JSON_MIMETYPE, MSGPACK_MIMETYPE]
+
+
+def to_label_predictions(detections, labels):
+    """One object per detection, in the same form as the marshaled default JSON response."""
+    return [
+        {'label_id': str(label_id), 'label': label, 'probability': score, 'detection_box': box}
+        for label_id, label, score, box in zip(detections['detection_classes'].tolist(), labels,
+                                               detections['detection_scores'].tolist(),
+                                               detections['detection_boxes'].tolist())
+    ]
+
+
+def to_columnar(detections, labels):
+    """Parallel arrays of label ids, labels, probabilities and flattened [ymin, xmin, ymax, xmax] boxes."""
+    return {
+        'status': 'ok',
+        'count': len(labels),
+        'label_ids': detections['detection_classes'].tolist(),
+        'labels': list(labels),
+        'probabilities': detections['detection_scores'].tolist(),
+        'detection_boxes': detections['detection_boxes'].reshape(-1).tolist()
+    }
+
+
+def to_columnar_json(detections, labels):
+    return json.dumps(to_columnar(detections, labels), separators=(',', ':'))
+
+
+def to_msgpack(detections, labels):
+    """Columnar MessagePack document; numeric columns are raw int32 / float32 little-endian buffers.
+
+    Clients decode them with e.g. `numpy.frombuffer(doc['detection_boxes'], '<f4').reshape(-1, 4)`.
+    """
+    return msgpack.packb({
+        'status': 'ok',
+        'count': len(labels),
+        'label_ids': detections['detection_classes'].astype('<i4').tobytes(),
+        'labels': list(labels),
+        'probabilities': detections['detection_scores'].astype('<f4').tobytes(),
+        'detection_boxes': detections['detection_boxes'].astype('<f4').tobytes()
+    }, use_bin_type=True)
@@ -0,0 +1,94 @@
+#
+# Copyright 2018-2021 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Inputs that are already decoded: raw uint8 tensors uploaded with the request, or files in a shared
+directory (e.g. /dev/shm) written by a co-located client. Both are used in place, without an
+encode/decode round trip or extra copies; shared files are memory-mapped.
+"""
+
+import io
+import os
+
+import numpy as np
+
+
+def parse_image_shape(value):
+    """Parse a "height,width" or "height,width,3" string"""
+    try:
+        shape = tuple(int(v) for v in value.split(','))
+    except ValueError:
+        raise ValueError('expected comma-separated integers')
+    if len(shape) == 2:
+        shape += (3,)
+    if len(shape) != 3 or shape[2] != 3 or min(shape) < 1:
+        raise ValueError('expected a shape of the form height,width or height,width,3')
+    return shape
+
+
+def _check_tensor(array):
+    if (array.dtype != np.uint8 or array.ndim != 3 or array.shape[2] != 3 or min(array.shape[:2]) < 1 or
+            not array.flags.c_contiguous):
+        raise ValueError('Expected a C-ordered uint8 tensor of shape (height, width, 3), got {} {}'.format(
+            array.dtype, array.shape))
+    return array
+
+
+def tensor_from_bytes(data, shape=None):
+    """Wrap uploaded tensor bytes without copying.
+
+    The data is either in `.npy` format, whose header carries the shape, or raw uint8 pixels of the
+    given shape.
+    """
+    if shape is None:
+        buffer = io.BytesIO(data)
+        try:
+            version = np.lib.format.read_magic(buffer)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else \
+                np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(buffer)
+        except ValueError:
+            raise ValueError('Tensor is not in .npy format; pass image_shape for raw pixels')
+        if fortran_order:
+            raise ValueError('Fortran-ordered tensors are not supported')
+        array = np.frombuffer(data, dtype=dtype, count=int(np.prod(shape)), offset=buffer.tell()).reshape(shape)
+    else:
+        if len(data) != np.prod(shape):
+            raise ValueError('Expected {} bytes for shape {}, got {}'.format(np.prod(shape), shape, len(data)))
+        array = np.frombuffer(data, dtype=np.uint8).reshape(shape)
+    return _check_tensor(array)
+
+
+def load_shared_tensor(path, allowed_dirs, shape=None):
+    """Memory-map a tensor file from one of the allowed shared directories.
+
+    `.npy` files carry their own shape; other files hold raw uint8 pixels of the given shape.
+    Raises PermissionError for paths outside the allowed directories.
+    """
+    real_path = os.path.realpath(path)
+    if not any(os.path.commonpath([real_path, os.path.realpath(d)]) == os.path.realpath(d) for d in allowed_dirs):
+        raise PermissionError('Path is not inside an allowed shared directory')
+    if not os.path.isfile(real_path):
+        raise ValueError('No such file: {}'.format(path))
+    if shape is None:
+        try:
+            array = np.load(real_path, mmap_mode='r', allow_pickle=False)
+        except ValueError:
+            raise ValueError('File is not in .npy format; pass image_shape for raw pixels')
+    else:
+        if os.path.getsize(real_path) != np.prod(shape):
+            raise ValueError('File size does not match shape {}'.format(shape))
+        array = np.memmap(real_path, dtype=np.uint8, mode='r', shape=shape)
+    return _check_tensor(array)
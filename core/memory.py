@@ -0,0 +1,174 @@
+#
+# Copyright 2018-2021 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import io
+import resource
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from PIL import Image
+
+# bytes held per pixel while an image is decoded: the decoded image (up to 4 bands), its RGB
+# conversion and the uint8 array handed to the model
+DECODE_BYTES_PER_PIXEL = 10
+
+
+class ImageTooLargeError(Exception):
+    """Raised when an image has more pixels than allowed."""
+
+
+class MemoryBudgetExceededError(Exception):
+    """Raised when a request cannot reserve its memory before its deadline or the budget wait times out."""
+
+
+def image_size(image_data):
+    """Return the (width, height) of an encoded image by reading its header only, without decoding it."""
+    try:
+        with Image.open(io.BytesIO(image_data)) as image:
+            return image.size
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e))
+
+
+def check_pixels(width, height, max_pixels):
+    if max_pixels and width * height > max_pixels:
+        raise ImageTooLargeError('Image of {}x{} pixels exceeds the limit of {} pixels'.format(width, height,
+                                                                                               max_pixels))
+
+
+def batch_size_for(height, width, max_images, max_pixels=None):
+    """Largest number of images of a shape that fit in a batch, and at least one."""
+    if not max_pixels:
+        return max_images
+    return max(1, min(max_images, max_pixels // (int(height) * int(width))))
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except (IOError, IndexError, ValueError):
+        return None
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Stage(object):
+    """Resident memory observed around one stage of request processing."""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.peak_rss = 0
+        self.max_growth = 0
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'calls': self.calls,
+            'peak_rss_bytes': self.peak_rss,
+            'max_growth_bytes': self.max_growth
+        }
+
+
+class MemoryBudget(object):
+    """Global budget of memory that in-flight requests reserve before decoding their input.
+
+    Each request reserves an estimate of the memory its input will take once decoded, and waits
+    while the reservations of other requests leave too little of the `max_bytes` budget. A request
+    that does not fit before its deadline (an absolute `time.monotonic()` value), or within
+    `wait_timeout` seconds when it has none, fails with MemoryBudgetExceededError. A request larger
+    than the whole budget runs once no other reservation is held. Without `max_bytes`, reservations
+    are only counted.
+
+    Stages wrapped with `stage()` record the process RSS after each call and its largest growth
+    during a call; with concurrent requests the growth is an upper bound for a single call.
+    """
+
+    def __init__(self, max_bytes=None, wait_timeout=5.0):
+        self.max_bytes = max_bytes
+        self.wait_timeout = wait_timeout
+        self.stages = OrderedDict()
+        self._cond = threading.Condition()
+        self._reserved = 0
+        self._peak_reserved = 0
+        self._rejected = 0
+
+    def _fits(self, nbytes):
+        return not self.max_bytes or self._reserved == 0 or self._reserved + nbytes <= self.max_bytes
+
+    def acquire(self, nbytes, deadline=None):
+        """Reserve `nbytes` of the budget, waiting for other requests to release theirs if needed."""
+        if deadline is None:
+            deadline = time.monotonic() + self.wait_timeout
+        with self._cond:
+            while not self._fits(nbytes):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._rejected += 1
+                    raise MemoryBudgetExceededError('Memory budget of {} bytes is in use'.format(self.max_bytes))
+                self._cond.wait(min(remaining, threading.TIMEOUT_MAX))
+            self._reserved += nbytes
+            self._peak_reserved = max(self._peak_reserved, self._reserved)
+
+    def release(self, nbytes):
+        with self._cond:
+            self._reserved -= nbytes
+            self._cond.notify_all()
+
+    @contextmanager
+    def reserve(self, nbytes, deadline=None):
+        """Hold `nbytes` of the budget for the duration of the block."""
+        self.acquire(nbytes, deadline)
+        try:
+            yield
+        finally:
+            self.release(nbytes)
+
+    @contextmanager
+    def stage(self, name):
+        """Record the resident memory of the process around a stage of request processing."""
+        before = current_rss()
+        try:
+            yield
+        finally:
+            after = current_rss()
+            with self._cond:
+                stage = self.stages.get(name)
+                if stage is None:
+                    stage = self.stages[name] = Stage(name)
+                stage.calls += 1
+                if after is not None:
+                    stage.peak_rss = max(stage.peak_rss, after)
+                    stage.max_growth = max(stage.max_growth, after - before)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'budget_bytes': self.max_bytes,
+                'reserved_bytes': self._reserved,
+                'peak_reserved_bytes': self._peak_reserved,
+                'rejected': self._rejected,
+                'rss_bytes': current_rss(),
+                'peak_rss_bytes': peak_rss(),
+                'stages': [stage.stats() for stage in self.stages.values()]
+            }
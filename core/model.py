@@ -1,5 +1,5 @@
 #
-# Copyright 2018-2019 IBM Corp. All Rights Reserved.
+# Copyright 2018-2021 IBM Corp. All Rights Reserved.
 #
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
@@ -14,26 +14,57 @@
 # limitations under the License.
 #
 
-from PIL import Image
 import tensorflow as tf
 from config import MODEL_META_DATA as model_meta
 from maxfw.model import MAXModelWrapper
-import io
 import numpy as np
 import flask
 import logging
-from config import PATH_TO_CKPT, PATH_TO_LABELS, NUM_CLASSES
+from PIL import Image
+from config import PATH_TO_CKPT, PATH_TO_LABELS, PATH_TO_LABELS_CACHE
+from config import MAX_BATCH_SIZE, TILE_OVERLAP, TILE_NMS_IOU_THRESHOLD, TILE_INCLUDE_FULL_IMAGE
+from config import MAX_TILES, MAX_ROIS, TILE_WINDOW_MAX_DETECTIONS
+from config import INFERENCE_CONCURRENCY, PRIORITY_LANES, DEFAULT_PRIORITY, PRIORITY_API_KEYS
+from config import DECODE_EXECUTOR, DECODE_WORKERS, SHAPE_BUCKETS, SHAPE_BUCKET_MODE
+from config import (STREAM_MAX_SESSIONS, STREAM_FINGERPRINT_SIZE, STREAM_DELTA_THRESHOLD, STREAM_MAX_SKIPPED_FRAMES,
+                    STREAM_MAX_STALE_SECONDS)
+from config import MAX_IMAGE_PIXELS, MAX_BATCH_PIXELS, MEMORY_BUDGET_BYTES, MEMORY_BUDGET_WAIT
+from core.boxes import tile_windows, windows_to_image, non_max_suppression, normalized_to_windows, fit_within
+from core.buckets import ShapeBuckets, bucket_to_image
+from core.memory import MemoryBudget, DECODE_BYTES_PER_PIXEL, batch_size_for, check_pixels, image_size
+from core.pipeline import Pipeline
+from core.scheduler import InferenceQueue
+from core.streams import StreamCache
 from utils import label_map_util
-import utils.ops
 
 logger = logging.getLogger()
 
 
+def downscale(image, max_side):
+    """Scale a uint8 image down to at most `max_side` pixels per side, keeping its aspect ratio.
+
+    The image is strided first, so that a large view is never copied at full resolution.
+    """
+    height, width = image.shape[:2]
+    if max(height, width) <= max_side:
+        return image
+    step = max(height, width) // max_side
+    image = np.ascontiguousarray(image[::step, ::step])
+    target_h, target_w = fit_within(height, width, max_side)
+    if image.shape[:2] == (target_h, target_w):
+        return image
+    return np.asarray(Image.fromarray(image).resize((target_w, target_h), Image.BILINEAR))
+
+
 class ModelWrapper(MAXModelWrapper):
 
     MODEL_META_DATA = model_meta
 
-    def __init__(self, model_file=PATH_TO_CKPT, label_file=PATH_TO_LABELS):
+    def __init__(self, model_file=PATH_TO_CKPT, label_file=PATH_TO_LABELS, label_cache_file=PATH_TO_LABELS_CACHE):
+        # start the decode workers first, so that forked decode processes do not inherit a TensorFlow session
+        self.pipeline = Pipeline(DECODE_EXECUTOR, DECODE_WORKERS, INFERENCE_CONCURRENCY)
+        self.memory = MemoryBudget(MEMORY_BUDGET_BYTES, MEMORY_BUDGET_WAIT)
+
         logger.info('Loading model from: {}...'.format(model_file))
         detection_graph = tf.Graph()
         graph = tf.Graph()
@@ -48,83 +79,245 @@ class ModelWrapper(MAXModelWrapper):
                     od_graph_def.ParseFromString(serialized_graph)
                     tf.import_graph_def(od_graph_def, name='')
 
-                # loading a label map
-                label_map = label_map_util.load_labelmap(label_file)
-                categories = label_map_util.convert_label_map_to_categories(label_map, max_num_classes=NUM_CLASSES,
+                # loading a label map; the number of classes is derived from the largest id in the label map
+                label_map = label_map_util.load_labelmap_cached(label_file, label_cache_file)
+                num_classes = label_map_util.get_max_label_map_index(label_map)
+                categories = label_map_util.convert_label_map_to_categories(label_map, max_num_classes=num_classes,
                                                                             use_display_name=True)
                 category_index = label_map_util.create_category_index(categories)
+                label_names = label_map_util.create_label_name_table(categories)
+
+        # resolve the input and output tensors once and keep a session open for the lifetime of the wrapper
+        all_tensor_names = {output.name for op in graph.get_operations() for output in op.outputs}
+        tensor_dict = {}
+        for key in ['num_detections', 'detection_boxes', 'detection_scores', 'detection_classes']:
+            tensor_name = key + ':0'
+            if tensor_name in all_tensor_names:
+                tensor_dict[key] = graph.get_tensor_by_name(tensor_name)
 
         # set up instance variables
         self.graph = graph
+        self.sess = tf.compat.v1.Session(graph=graph)
+        self.image_tensor = graph.get_tensor_by_name('image_tensor:0')
+        self.tensor_dict = tensor_dict
         self.category_index = category_index
         self.categories = categories
+        self.label_names = label_names
+        self.buckets = (ShapeBuckets(SHAPE_BUCKETS, SHAPE_BUCKET_MODE, MAX_BATCH_SIZE, MAX_BATCH_PIXELS)
+                        if SHAPE_BUCKETS else None)
+        self.queue = InferenceQueue(PRIORITY_LANES, INFERENCE_CONCURRENCY, DEFAULT_PRIORITY, PRIORITY_API_KEYS)
+        self.stream_cache = StreamCache(STREAM_MAX_SESSIONS, STREAM_FINGERPRINT_SIZE, STREAM_DELTA_THRESHOLD,
+                                        STREAM_MAX_SKIPPED_FRAMES, STREAM_MAX_STALE_SECONDS)
+
+    def _input_cost(self, image_input, tile_size=None, tile_overlap=TILE_OVERLAP, rois=None):
+        """Estimate the memory taken by an encoded image or a uint8 array until its inference completes.
+
+        Only the header of an encoded image is read. Raises ImageTooLargeError for images with more than
+        MAX_IMAGE_PIXELS pixels, ValueError when the tiles or regions of interest exceed their limits and
+        IOError for unrecognized formats.
+        """
+        if isinstance(image_input, np.ndarray):
+            height, width = image_input.shape[:2]
+            check_pixels(width, height, MAX_IMAGE_PIXELS)
+            # the array itself is already held (or mapped)
+            cost = 0
+        else:
+            width, height = image_size(image_input)
+            check_pixels(width, height, MAX_IMAGE_PIXELS)
+            cost = width * height * DECODE_BYTES_PER_PIXEL
+        # inference stacks a copy of every window (the whole image, regions or tiles) into its batches,
+        # with windows larger than a tile scaled down to the tile size
+        windows = self._windows(height, width, tile_size, tile_overlap, rois)
+        for ymin, xmin, ymax, xmax in windows:
+            window_h, window_w = ymax - ymin, xmax - xmin
+            if tile_size:
+                window_h, window_w = fit_within(window_h, window_w, tile_size)
+            cost += int(window_h) * int(window_w) * 3
+        return cost
+
+    def _windows(self, height, width, tile_size=None, tile_overlap=TILE_OVERLAP, rois=None):
+        """Pixel windows of an image that are run through the model, for the given tiling and regions.
+
+        Raises ValueError with more than MAX_ROIS regions or MAX_TILES windows.
+        """
+        if rois is None:
+            regions = np.array([[0, 0, height, width]])
+        elif len(rois) > MAX_ROIS:
+            raise ValueError('At most {} regions of interest are allowed'.format(MAX_ROIS))
+        else:
+            regions = normalized_to_windows(rois, height, width)
+
+        windows, count = [], 0
+        for region in regions:
+            ymin, xmin, ymax, xmax = region
+            tiles = tile_windows(ymax - ymin, xmax - xmin, tile_size, tile_overlap, MAX_TILES - count) if tile_size else []
+            if len(tiles) <= 1 or TILE_INCLUDE_FULL_IMAGE:
+                windows.append(region[np.newaxis])
+            if len(tiles) > 1:
+                windows.append(tiles + [ymin, xmin, ymin, xmin])
+            count = sum(len(window) for window in windows)
+            if count > MAX_TILES:
+                raise ValueError('The image would be split into more than {} tiles; use a larger tile_size or a '
+                                 'smaller tile_overlap'.format(MAX_TILES))
+        return np.concatenate(windows)
 
     def _read_image(self, image_data):
+        """Decode an uploaded image into a uint8 array on the decode pool."""
         try:
-            image = Image.open(io.BytesIO(image_data)).convert("RGB")
+            with self.memory.stage('decode'):
+                image = self.pipeline.decode(image_data).result()
         except IOError:
             flask.abort(400, 'Unrecognized image format')
         return image
 
+    def _read_images(self, images_data):
+        """Decode several encoded images concurrently on the decode pool.
+
+        Returns, in input order, the uint8 array or the IOError raised for each image.
+        """
+        with self.memory.stage('decode'):
+            futures = [self.pipeline.decode(image_data) for image_data in images_data]
+            images = []
+            for future in futures:
+                try:
+                    images.append(future.result())
+                except IOError as e:
+                    images.append(e)
+        return images
+
     def _pre_process(self, image):
-        (im_width, im_height) = image.size
-        return np.array(image.getdata()).reshape(
-            (im_height, im_width, 3)).astype(np.uint8)
+        return np.asarray(image, dtype=np.uint8)
+
+    def _run_inference(self, images, deadline=None):
+        """Run the detection graph on a uint8 batch of shape (N, H, W, 3)."""
+        self.queue.check_deadline(deadline)
+        with self.memory.stage('inference'):
+            output_dict = self.sess.run(self.tensor_dict, feed_dict={self.image_tensor: images})
+
+        # all outputs are float32 numpy arrays, so convert types as appropriate
+        output_dict['num_detections'] = output_dict['num_detections'].astype(np.int32)
+        output_dict['detection_classes'] = output_dict['detection_classes'].astype(np.int32)
+        return output_dict
+
+    def _infer_images(self, images, deadline=None):
+        """Run inference on a list of uint8 images of any shape.
+
+        Images are grouped by shape, or by shape bucket when SHAPE_BUCKETS is configured, and stacked
+        into batches of at most MAX_BATCH_SIZE images and MAX_BATCH_PIXELS pixels. Returns the output
+        arrays in input order, with boxes normalized to each image.
+        """
+        groups = {}
+        for i, image in enumerate(images):
+            key = self.buckets.select(*image.shape[:2]) if self.buckets else image.shape[:2]
+            groups.setdefault(key, []).append(i)
+
+        boxes, scores, classes = [None] * len(images), [None] * len(images), [None] * len(images)
+        for key, indices in groups.items():
+            batch_size = batch_size_for(key[0], key[1], MAX_BATCH_SIZE, MAX_BATCH_PIXELS)
+            for start in range(0, len(indices), batch_size):
+                chunk = indices[start:start + batch_size]
+                if self.buckets:
+                    with self.buckets.buffer(key) as buffer:
+                        content_shapes = [self.buckets.fill(buffer, j, key, images[i]) for j, i in enumerate(chunk)]
+                        output_dict = self._run_inference(buffer[:len(chunk)], deadline)
+                    chunk_boxes, chunk_scores = bucket_to_image(output_dict['detection_boxes'],
+                                                                output_dict['detection_scores'], key, content_shapes)
+                else:
+                    batch = images[chunk[0]][np.newaxis] if len(chunk) == 1 else np.stack([images[i] for i in chunk])
+                    output_dict = self._run_inference(batch, deadline)
+                    chunk_boxes, chunk_scores = output_dict['detection_boxes'], output_dict['detection_scores']
+                for j, i in enumerate(chunk):
+                    boxes[i] = chunk_boxes[j]
+                    scores[i] = chunk_scores[j]
+                    classes[i] = output_dict['detection_classes'][j]
+        return {
+            'detection_boxes': np.stack(boxes),
+            'detection_scores': np.stack(scores),
+            'detection_classes': np.stack(classes)
+        }
+
+    def _detect_windows(self, image, windows, deadline=None, max_side=None):
+        """Run inference on the given pixel windows of an image.
+
+        Windows with a side longer than `max_side` are scaled down first; boxes are normalized to their
+        window, so they map back the same way. The returned detections are flattened across windows and
+        normalized to the full image.
+        """
+        height, width = image.shape[:2]
+        crops = [image[ymin:ymax, xmin:xmax] for ymin, xmin, ymax, xmax in windows]
+        if max_side:
+            crops = [downscale(crop, max_side) for crop in crops]
+        output_dict = self._infer_images(crops, deadline)
+        if len(windows) > 1:
+            # the model returns the detections of each window by descending score
+            output_dict = {key: value[:, :TILE_WINDOW_MAX_DETECTIONS] for key, value in output_dict.items()}
+        return {
+            'detection_boxes': windows_to_image(output_dict['detection_boxes'], windows, height, width).reshape(-1, 4),
+            'detection_scores': output_dict['detection_scores'].reshape(-1),
+            'detection_classes': output_dict['detection_classes'].reshape(-1)
+        }
 
-    def _predict(self, imageRaw, threshold):  # was originally run_inference_for_single_image
+    def _detect(self, image, threshold, tile_size=None, tile_overlap=TILE_OVERLAP, rois=None, deadline=None):
+        """Detect objects in a uint8 image array.
+
+        When `rois` (normalized [ymin, xmin, ymax, xmax] rows) are given, only those regions are cropped
+        and run through the model. Each region may further be split into overlapping tiles; the whole
+        region is then also run, scaled down to the tile size, so that objects larger than a tile are found. Detections
+        from different windows are merged with per-class non-maximum suppression so that objects lying
+        on a tile seam or in overlapping regions are only reported once. Batches that have not started
+        by `deadline` (an absolute `time.monotonic()` value) are dropped with DeadlineExceededError.
+        """
+        height, width = image.shape[:2]
+        windows = self._windows(height, width, tile_size, tile_overlap, rois)
+        detections = self._detect_windows(image, windows, deadline, tile_size)
+        keep = detections['detection_scores'] > threshold
+        detections = {key: value[keep] for key, value in detections.items()}
+        if len(windows) > 1:
+            keep = non_max_suppression(detections['detection_boxes'], detections['detection_scores'],
+                                       detections['detection_classes'], TILE_NMS_IOU_THRESHOLD)
+            detections = {key: value[keep] for key, value in detections.items()}
+        return detections
+
+    def _predict_batch(self, images, threshold, deadline=None):
+        """Detect objects in several images, which share batches where their shapes (or buckets) match."""
+        if not images:
+            return []
+        output_dict = self._infer_images([self._pre_process(image) for image in images], deadline)
+        results = []
+        for boxes, scores, classes in zip(output_dict['detection_boxes'], output_dict['detection_scores'],
+                                          output_dict['detection_classes']):
+            keep = scores > threshold
+            results.append({
+                'detection_boxes': boxes[keep],
+                'detection_scores': scores[keep],
+                'detection_classes': classes[keep]
+            })
+        return results
+
+    def _label_names(self, classes):
+        """Look up the names of an array of class ids in the dense label table."""
+        classes = np.asarray(classes)
+        known = classes < len(self.label_names)
+        names = self.label_names[np.where(known, classes, 0)]
+        names[~known] = self.label_names[0]
+        return names.tolist()
+
+    def _post_process(self, detections):
+        label_preds = []
+        for label_id, label, score, box in zip(detections['detection_classes'],
+                                               self._label_names(detections['detection_classes']),
+                                               detections['detection_scores'], detections['detection_boxes']):
+            label_preds.append(
+                {'label_id': label_id,
+                 'label': label,
+                 'probability': score,
+                 'detection_box': box.tolist()
+                 }
+            )
+        return label_preds
+
+    def _predict(self, imageRaw, threshold, tile_size=None, tile_overlap=TILE_OVERLAP, rois=None, deadline=None):
+        """Return the detection arrays for an image; `_post_process` turns them into label predictions."""
         image = self._pre_process(imageRaw)
         logger.info('image loaded')
-        with self.graph.as_default():
-            with tf.compat.v1.Session() as sess:
-                # Get handles to input and output tensors
-                ops = tf.compat.v1.get_default_graph().get_operations()
-                all_tensor_names = {output.name for op in ops for output in op.outputs}
-                tensor_dict = {}
-                for key in ['num_detections', 'detection_boxes', 'detection_scores', 'detection_classes',
-                            'detection_masks']:
-                    tensor_name = key + ':0'
-                    if tensor_name in all_tensor_names:
-                        tensor_dict[key] = tf.compat.v1.get_default_graph().get_tensor_by_name(tensor_name)
-                if 'detection_masks' in tensor_dict:
-                    # The following processing is only for single image
-                    detection_boxes = tf.squeeze(tensor_dict['detection_boxes'], [0])
-                    detection_masks = tf.squeeze(tensor_dict['detection_masks'], [0])
-                    # Re-frame is required to translate mask from box coordinates to image coordinates and fit the image
-                    # size.
-                    real_num_detection = tf.cast(tensor_dict['num_detections'][0], tf.int32)
-                    detection_boxes = tf.slice(detection_boxes, [0, 0], [real_num_detection, -1])
-                    detection_masks = tf.slice(detection_masks, [0, 0, 0], [real_num_detection, -1, -1])
-                    detection_masks_reframed = utils.ops.reframe_box_masks_to_image_masks(detection_masks,
-                                                                                          detection_boxes,
-                                                                                          image.shape[0],
-                                                                                          image.shape[1])
-                    detection_masks_reframed = tf.cast(tf.greater(detection_masks_reframed, 0.5), tf.uint8)
-                    # Follow the convention by adding back the batch dimension
-                    tensor_dict['detection_masks'] = tf.expand_dims(detection_masks_reframed, 0)
-                image_tensor = tf.compat.v1.get_default_graph().get_tensor_by_name('image_tensor:0')
-
-                # Run inference
-                output_dict = sess.run(tensor_dict, feed_dict={image_tensor: np.expand_dims(image, 0)})
-
-                # all outputs are float32 numpy arrays, so convert types as appropriate
-                output_dict['num_detections'] = int(output_dict['num_detections'][0])
-                output_dict['detection_classes'] = output_dict[
-                      'detection_classes'][0].astype(np.uint8)
-                output_dict['detection_boxes'] = output_dict['detection_boxes'][0]
-                output_dict['detection_scores'] = output_dict['detection_scores'][0]
-                if 'detection_masks' in output_dict:
-                    output_dict['detection_masks'] = output_dict['detection_masks'][0]
-            # TODO:  Threshold setting of 0.7 is only an ad hoc setting to limit result size...
-            label_preds = []
-            for i, label_id in enumerate(output_dict['detection_classes']):
-                if output_dict['detection_scores'][i] > threshold:  # where to set this?
-                    label_preds.append(
-                        {'label_id': label_id,
-                            'label': self.category_index[label_id]['name'],
-                            'probability': output_dict['detection_scores'][i],
-                            'detection_box': output_dict['detection_boxes'][i].tolist()
-                         }
-                    )
-            # sending top 5 entries to output
-            # for i in range(min(5,len(label_preds))): print(label_preds[i])
-        return label_preds
+        return self._detect(image, threshold, tile_size, tile_overlap, rois, deadline)
@@ -0,0 +1,119 @@
+#
+# Copyright 2018-2021 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import io
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger()
+
+
+def decode_image(image_data):
+    """Decode an encoded image into an RGB uint8 array of shape (height, width, 3)."""
+    image = Image.open(io.BytesIO(image_data))
+    # converting an image that is already RGB would only copy it
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return np.asarray(image, dtype=np.uint8)
+
+
+class Pipeline(object):
+    """Executors that let decoding of one request overlap with inference of another.
+
+    Uploaded images are decoded and converted to uint8 arrays in a pool of `decode_workers` threads
+    or processes, and the ready arrays are handed to a separate executor with `inference_workers`
+    threads that runs the model. Worker processes are forked from a fork server that only imports this
+    module, never from the serving process with its threads and TensorFlow session; the fork server is
+    started eagerly, so the pipeline should be created before the session. A process pool that breaks
+    because one of its workers died (for example killed by the OOM killer) is replaced by a new one,
+    whose workers come from the same fork server. As with any fork server, the workers import the main
+    module of the program, which must therefore guard its work with `if __name__ == '__main__'`.
+    """
+
+    def __init__(self, decode_executor, decode_workers, inference_workers):
+        if decode_executor not in ('process', 'thread'):
+            raise ValueError('Unknown decode executor {}'.format(decode_executor))
+        self.decode_executor = decode_executor
+        self.decode_workers = decode_workers
+        if decode_executor == 'process':
+            self._mp_context = multiprocessing.get_context('forkserver')
+            # by default the fork server would import the main module, which loads the model
+            self._mp_context.set_forkserver_preload([__name__])
+        self.decode_pool = self._create_decode_pool()
+        if decode_executor == 'process':
+            list(self.decode_pool.map(abs, range(decode_workers)))
+        self.inference_pool = ThreadPoolExecutor(max_workers=inference_workers, thread_name_prefix='inference')
+        self._lock = threading.Lock()
+
+    def _create_decode_pool(self):
+        if self.decode_executor == 'process':
+            return ProcessPoolExecutor(max_workers=self.decode_workers, mp_context=self._mp_context)
+        return ThreadPoolExecutor(max_workers=self.decode_workers, thread_name_prefix='decode')
+
+    def _replace_decode_pool(self, broken_pool):
+        """Replace a broken process pool, unless another request already did."""
+        with self._lock:
+            if self.decode_pool is broken_pool:
+                logger.warning('A decode worker process died, replacing the decode pool')
+                self.decode_pool = self._create_decode_pool()
+        broken_pool.shutdown(wait=False)
+
+    def _submit_decode(self, image_data):
+        """Submit a decode to the current pool, returning the pool and the future."""
+        pool = self.decode_pool
+        try:
+            return pool, pool.submit(decode_image, image_data)
+        except BrokenProcessPool:
+            self._replace_decode_pool(pool)
+            pool = self.decode_pool
+            return pool, pool.submit(decode_image, image_data)
+
+    def decode(self, image_data):
+        """Schedule decoding of an encoded image, returning a future of its uint8 array.
+
+        An image whose worker process died is decoded once more on a new pool.
+        """
+        future = Future()
+        pool, attempt = self._submit_decode(image_data)
+
+        def retry(attempt):
+            if isinstance(attempt.exception(), BrokenProcessPool):
+                self._replace_decode_pool(pool)
+                try:
+                    self._submit_decode(image_data)[1].add_done_callback(finish)
+                except BaseException as e:
+                    future.set_exception(e)
+            else:
+                finish(attempt)
+
+        def finish(attempt):
+            if attempt.exception() is not None:
+                future.set_exception(attempt.exception())
+            else:
+                future.set_result(attempt.result())
+
+        attempt.add_done_callback(retry)
+        return future
+
+    def infer(self, fn, *args, **kwargs):
+        """Schedule a call into the model on the inference executor, returning a future of its result."""
+        return self.inference_pool.submit(fn, *args, **kwargs)
@@ -0,0 +1,196 @@
+#
+# Copyright 2018-2021 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+logger = logging.getLogger()
+
+# longest time budget a request may ask for
+MAX_DEADLINE_MS = 24 * 60 * 60 * 1000
+
+
+class QueueFullError(Exception):
+    """Raised when a request arrives while its lane of the inference queue is at its maximum depth."""
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a request's deadline passes before its inference could run."""
+
+
+def deadline_after(arrival, deadline_ms):
+    """Absolute deadline of a request that arrived at `arrival` with a budget of `deadline_ms`, if any."""
+    if deadline_ms is None:
+        return None
+    if not 0 <= deadline_ms <= MAX_DEADLINE_MS:
+        raise ValueError('deadline must be between 0 and {} milliseconds'.format(MAX_DEADLINE_MS))
+    return arrival + deadline_ms / 1000.0
+
+
+class Ticket(object):
+    """A request's place in one lane of the inference queue."""
+
+    def __init__(self, lane, deadline=None):
+        self.lane = lane
+        self.deadline = deadline
+        self.queued = True
+        self.granted = False
+
+
+class Lane(object):
+    """A priority class with its own bounded queue and scheduling weight."""
+
+    def __init__(self, name, weight, max_depth):
+        self.name = name
+        self.weight = weight
+        self.max_depth = max_depth
+        self.waiters = deque()
+        self.credit = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'weight': self.weight,
+            'max_depth': self.max_depth,
+            'queued': self.queued,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'completed': self.completed
+        }
+
+
+class InferenceQueue(object):
+    """Bounded admission queue in front of the model, with one lane per priority class.
+
+    Requests are admitted into their lane as soon as they arrive, so that a full lane rejects them
+    before their upload is decoded. Admitted requests then wait for one of `concurrency` inference
+    slots; free slots are handed out across the lanes with waiting requests by smooth weighted
+    round robin, so a burst in a low-weight lane only uses the capacity left over by the others.
+    Deadlines are absolute `time.monotonic()` values.
+    """
+
+    def __init__(self, lanes, concurrency, default_lane, api_key_lanes=None):
+        self.lanes = OrderedDict((name, Lane(name, **config)) for name, config in lanes.items())
+        self.concurrency = concurrency
+        self.default_lane = default_lane
+        self.api_key_lanes = api_key_lanes or {}
+        self._cond = threading.Condition()
+        self._running = 0
+        self._expired = 0
+
+    def lane_for(self, priority=None, api_key=None):
+        """Name of the lane for a request; API key mappings take precedence over a requested priority."""
+        if api_key in self.api_key_lanes:
+            return self.api_key_lanes[api_key]
+        if priority is None:
+            return self.default_lane
+        if priority not in self.lanes:
+            raise ValueError('Unknown priority {}, expected one of: {}'.format(priority, ', '.join(self.lanes)))
+        return priority
+
+    @contextmanager
+    def admit(self, lane=None, deadline=None):
+        """Reserve a place in a lane for a request, raising QueueFullError when there is none."""
+        lane = self.lanes[lane or self.default_lane]
+        with self._cond:
+            if lane.queued >= lane.max_depth:
+                lane.rejected += 1
+                logger.warning('Inference queue lane %s full (%d queued), rejecting request', lane.name, lane.queued)
+                raise QueueFullError()
+            lane.queued += 1
+            lane.admitted += 1
+        ticket = Ticket(lane, deadline)
+        try:
+            yield ticket
+        finally:
+            with self._cond:
+                if ticket.queued:
+                    lane.queued -= 1
+
+    @contextmanager
+    def slot(self, ticket):
+        """Wait for an inference slot, raising DeadlineExceededError if the ticket's deadline passes first."""
+        lane = ticket.lane
+        with self._cond:
+            lane.waiters.append(ticket)
+            self._dispatch()
+            try:
+                while not ticket.granted:
+                    timeout = None if ticket.deadline is None else ticket.deadline - time.monotonic()
+                    if timeout is not None and timeout <= 0:
+                        self._expired += 1
+                        raise DeadlineExceededError()
+                    self._cond.wait(None if timeout is None else min(timeout, threading.TIMEOUT_MAX))
+            except BaseException:
+                # never leave an abandoned ticket behind: it would be granted a slot that is never released
+                if ticket.granted:
+                    self._running -= 1
+                    self._dispatch()
+                else:
+                    lane.waiters.remove(ticket)
+                raise
+            ticket.queued = False
+            lane.queued -= 1
+        try:
+            self.check_deadline(ticket.deadline)
+            yield
+        finally:
+            with self._cond:
+                self._running -= 1
+                lane.completed += 1
+                self._dispatch()
+
+    def _dispatch(self):
+        """Grant free inference slots to waiting tickets; must be called with the condition held."""
+        while self._running < self.concurrency:
+            ready = [lane for lane in self.lanes.values() if lane.waiters]
+            if not ready:
+                return
+            for lane in ready:
+                lane.credit += lane.weight
+            lane = max(ready, key=lambda candidate: candidate.credit)
+            lane.credit -= sum(candidate.weight for candidate in ready)
+            lane.waiters.popleft().granted = True
+            self._running += 1
+            self._cond.notify_all()
+
+    def check_deadline(self, deadline):
+        """Drop work whose deadline has already passed, before it reaches the model."""
+        if deadline is not None and time.monotonic() > deadline:
+            with self._cond:
+                self._expired += 1
+            raise DeadlineExceededError()
+
+    def stats(self):
+        with self._cond:
+            lanes = [lane.stats() for lane in self.lanes.values()]
+            return {
+                'queued': sum(lane['queued'] for lane in lanes),
+                'running': self._running,
+                'concurrency': self.concurrency,
+                'admitted': sum(lane['admitted'] for lane in lanes),
+                'rejected': sum(lane['rejected'] for lane in lanes),
+                'expired': self._expired,
+                'completed': sum(lane['completed'] for lane in lanes),
+                'lanes': lanes
+            }
@@ -0,0 +1,117 @@
+#
+# Copyright 2018-2021 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def fingerprint(image, size):
+    """Downsample a uint8 image to a grayscale grid of at most `size` x `size` cell means.
+
+    The image is strided first so that each cell averages only a few pixels, which keeps the cost
+    independent of the image resolution.
+    """
+    height, width = image.shape[:2]
+    step = max(1, min(height, width) // (size * 4))
+    sample = image[::step, ::step]
+    gray = sample.mean(axis=2, dtype=np.float32) if sample.ndim == 3 else sample.astype(np.float32)
+    rows, cols = gray.shape
+    row_edges = np.arange(min(size, rows)) * rows // min(size, rows)
+    col_edges = np.arange(min(size, cols)) * cols // min(size, cols)
+    sums = np.add.reduceat(np.add.reduceat(gray, row_edges, axis=0), col_edges, axis=1)
+    counts = np.outer(np.diff(np.append(row_edges, rows)), np.diff(np.append(col_edges, cols)))
+    return sums / counts
+
+
+class StreamState(object):
+    """The last inferred frame of a stream and the detections returned for it."""
+
+    def __init__(self, fingerprint, params, detections):
+        self.fingerprint = fingerprint
+        self.params = params
+        self.detections = detections
+        self.inferred_at = time.monotonic()
+        self.skipped = 0
+
+
+class StreamCache(object):
+    """Remembers the last inferred frame of each camera stream so that unchanged frames can skip the model.
+
+    A frame is compared with the fingerprint of the last frame of its stream that was run through the
+    model, not with the previous frame, so slow drift still triggers inference. It is skipped when no
+    fingerprint cell changed by `delta_threshold` or more, as a fraction of the full intensity range,
+    and the request parameters are unchanged. Deciding on the largest cell change rather than the mean
+    keeps a small new object, such as a person entering a doorway, from being averaged away. At most
+    `max_skipped_frames` frames in a row are skipped, and none once `max_stale_seconds` have passed
+    since the last inference. Only the `max_streams` most recently used streams are remembered; 0
+    disables skipping.
+    """
+
+    def __init__(self, max_streams, fingerprint_size, delta_threshold, max_skipped_frames, max_stale_seconds):
+        self.max_streams = max_streams
+        self.fingerprint_size = fingerprint_size
+        self.delta_threshold = delta_threshold
+        self.max_skipped_frames = max_skipped_frames
+        self.max_stale_seconds = max_stale_seconds
+        self._streams = OrderedDict()
+        self._lock = threading.Lock()
+        self._frames = 0
+        self._skipped = 0
+
+    def lookup(self, stream_id, image, params):
+        """Return the cached detections for a frame, or None, together with the frame's fingerprint.
+
+        `params` is any hashable value holding the request parameters that affect the detections.
+        """
+        frame_fingerprint = fingerprint(image, self.fingerprint_size)
+        with self._lock:
+            self._frames += 1
+            state = self._streams.get(stream_id)
+            if state is None or not self.max_streams:
+                return None, frame_fingerprint
+            self._streams.move_to_end(stream_id)
+            if (state.params != params or state.fingerprint.shape != frame_fingerprint.shape or
+                    state.skipped >= self.max_skipped_frames or
+                    time.monotonic() - state.inferred_at > self.max_stale_seconds):
+                return None, frame_fingerprint
+            delta = np.abs(frame_fingerprint - state.fingerprint).max() / 255
+            if delta >= self.delta_threshold:
+                return None, frame_fingerprint
+            state.skipped += 1
+            self._skipped += 1
+            return state.detections, frame_fingerprint
+
+    def store(self, stream_id, frame_fingerprint, params, detections):
+        """Remember the detections of a frame that was run through the model."""
+        if not self.max_streams:
+            return
+        with self._lock:
+            self._streams[stream_id] = StreamState(frame_fingerprint, params, detections)
+            self._streams.move_to_end(stream_id)
+            while len(self._streams) > self.max_streams:
+                self._streams.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'streams': len(self._streams),
+                'frames': self._frames,
+                'skipped': self._skipped,
+                'inferred': self._frames - self._skipped
+            }
@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: protos/detector.proto
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import message as _message
+from google.protobuf import reflection as _reflection
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor.FileDescriptor(
+  name='protos/detector.proto',
+  package='max.object_detector',
+  syntax='proto3',
+  serialized_options=None,
+  create_key=_descriptor._internal_create_key,
+  serialized_pb=b'\n\x15protos/detector.proto\x12\x13max.object_detector\"5\n\x06Tensor\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\x0e\n\x06height\x18\x02 \x01(\x05\x12\r\n\x05width\x18\x03 \x01(\x05\"E\n\x0b\x42oundingBox\x12\x0c\n\x04ymin\x18\x01 \x01(\x02\x12\x0c\n\x04xmin\x18\x02 \x01(\x02\x12\x0c\n\x04ymax\x18\x03 \x01(\x02\x12\x0c\n\x04xmax\x18\x04 \x01(\x02\"\xd2\x01\n\rDetectRequest\x12\x0f\n\x05image\x18\x01 \x01(\x0cH\x00\x12-\n\x06tensor\x18\x02 \x01(\x0b\x32\x1b.max.object_detector.TensorH\x00\x12\x11\n\tthreshold\x18\x03 \x01(\x02\x12-\n\x03roi\x18\x04 \x03(\x0b\x32 .max.object_detector.BoundingBox\x12\x11\n\ttile_size\x18\x05 \x01(\x05\x12\x11\n\tstream_id\x18\x06 \x01(\t\x12\x10\n\x08\x66rame_id\x18\x07 \x01(\x04\x42\x07\n\x05input\"p\n\tDetection\x12\x10\n\x08label_id\x18\x01 \x01(\x05\x12\r\n\x05label\x18\x02 \x01(\t\x12\x13\n\x0bprobability\x18\x03 \x01(\x02\x12-\n\x03\x62ox\x18\x04 \x01(\x0b\x32 .max.object_detector.BoundingBox\"\x98\x01\n\x0e\x44\x65tectResponse\x12\x10\n\x08\x66rame_id\x18\x01 \x01(\x04\x12\x32\n\ndetections\x18\x02 \x03(\x0b\x32\x1e.max.object_detector.Detection\x12\x15\n\rframe_skipped\x18\x03 \x01(\x08\x12\x12\n\nerror_code\x18\x04 \x01(\x05\x12\x15\n\rerror_message\x18\x05 \x01(\t2\xc0\x01\n\x0eObjectDetector\x12Q\n\x06\x44\x65tect\x12\".max.object_detector.DetectRequest\x1a#.max.object_detector.DetectResponse\x12[\n\x0c\x44\x65tectStream\x12\".max.object_detector.DetectRequest\x1a#.max.object_detector.DetectResponse(\x01\x30\x01\x62\x06proto3'
+)
+
+
+
+
+_TENSOR = _descriptor.Descriptor(
+  name='Tensor',
+  full_name='max.object_detector.Tensor',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  create_key=_descriptor._internal_create_key,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='data', full_name='max.object_detector.Tensor.data', index=0,
+      number=1, type=12, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"",
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='height', full_name='max.object_detector.Tensor.height', index=1,
+      number=2, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='width', full_name='max.object_detector.Tensor.width', index=2,
+      number=3, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=46,
+  serialized_end=99,
+)
+
+
+_BOUNDINGBOX = _descriptor.Descriptor(
+  name='BoundingBox',
+  full_name='max.object_detector.BoundingBox',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  create_key=_descriptor._internal_create_key,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='ymin', full_name='max.object_detector.BoundingBox.ymin', index=0,
+      number=1, type=2, cpp_type=6, label=1,
+      has_default_value=False, default_value=float(0),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='xmin', full_name='max.object_detector.BoundingBox.xmin', index=1,
+      number=2, type=2, cpp_type=6, label=1,
+      has_default_value=False, default_value=float(0),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='ymax', full_name='max.object_detector.BoundingBox.ymax', index=2,
+      number=3, type=2, cpp_type=6, label=1,
+      has_default_value=False, default_value=float(0),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='xmax', full_name='max.object_detector.BoundingBox.xmax', index=3,
+      number=4, type=2, cpp_type=6, label=1,
+      has_default_value=False, default_value=float(0),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=101,
+  serialized_end=170,
+)
+
+
+_DETECTREQUEST = _descriptor.Descriptor(
+  name='DetectRequest',
+  full_name='max.object_detector.DetectRequest',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  create_key=_descriptor._internal_create_key,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='image', full_name='max.object_detector.DetectRequest.image', index=0,
+      number=1, type=12, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"",
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='tensor', full_name='max.object_detector.DetectRequest.tensor', index=1,
+      number=2, type=11, cpp_type=10, label=1,
+      has_default_value=False, default_value=None,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='threshold', full_name='max.object_detector.DetectRequest.threshold', index=2,
+      number=3, type=2, cpp_type=6, label=1,
+      has_default_value=False, default_value=float(0),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='roi', full_name='max.object_detector.DetectRequest.roi', index=3,
+      number=4, type=11, cpp_type=10, label=3,
+      has_default_value=False, default_value=[],
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='tile_size', full_name='max.object_detector.DetectRequest.tile_size', index=4,
+      number=5, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='stream_id', full_name='max.object_detector.DetectRequest.stream_id', index=5,
+      number=6, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='frame_id', full_name='max.object_detector.DetectRequest.frame_id', index=6,
+      number=7, type=4, cpp_type=4, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+    _descriptor.OneofDescriptor(
+      name='input', full_name='max.object_detector.DetectRequest.input',
+      index=0, containing_type=None,
+      create_key=_descriptor._internal_create_key,
+    fields=[]),
+  ],
+  serialized_start=173,
+  serialized_end=383,
+)
+
+
+_DETECTION = _descriptor.Descriptor(
+  name='Detection',
+  full_name='max.object_detector.Detection',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  create_key=_descriptor._internal_create_key,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='label_id', full_name='max.object_detector.Detection.label_id', index=0,
+      number=1, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='label', full_name='max.object_detector.Detection.label', index=1,
+      number=2, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='probability', full_name='max.object_detector.Detection.probability', index=2,
+      number=3, type=2, cpp_type=6, label=1,
+      has_default_value=False, default_value=float(0),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='box', full_name='max.object_detector.Detection.box', index=3,
+      number=4, type=11, cpp_type=10, label=1,
+      has_default_value=False, default_value=None,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=385,
+  serialized_end=497,
+)
+
+
+_DETECTRESPONSE = _descriptor.Descriptor(
+  name='DetectResponse',
+  full_name='max.object_detector.DetectResponse',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  create_key=_descriptor._internal_create_key,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='frame_id', full_name='max.object_detector.DetectResponse.frame_id', index=0,
+      number=1, type=4, cpp_type=4, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='detections', full_name='max.object_detector.DetectResponse.detections', index=1,
+      number=2, type=11, cpp_type=10, label=3,
+      has_default_value=False, default_value=[],
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='frame_skipped', full_name='max.object_detector.DetectResponse.frame_skipped', index=2,
+      number=3, type=8, cpp_type=7, label=1,
+      has_default_value=False, default_value=False,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='error_code', full_name='max.object_detector.DetectResponse.error_code', index=3,
+      number=4, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+    _descriptor.FieldDescriptor(
+      name='error_message', full_name='max.object_detector.DetectResponse.error_message', index=4,
+      number=5, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR,  create_key=_descriptor._internal_create_key),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=500,
+  serialized_end=652,
+)
+
+_DETECTREQUEST.fields_by_name['tensor'].message_type = _TENSOR
+_DETECTREQUEST.fields_by_name['roi'].message_type = _BOUNDINGBOX
+_DETECTREQUEST.oneofs_by_name['input'].fields.append(
+  _DETECTREQUEST.fields_by_name['image'])
+_DETECTREQUEST.fields_by_name['image'].containing_oneof = _DETECTREQUEST.oneofs_by_name['input']
+_DETECTREQUEST.oneofs_by_name['input'].fields.append(
+  _DETECTREQUEST.fields_by_name['tensor'])
+_DETECTREQUEST.fields_by_name['tensor'].containing_oneof = _DETECTREQUEST.oneofs_by_name['input']
+_DETECTION.fields_by_name['box'].message_type = _BOUNDINGBOX
+_DETECTRESPONSE.fields_by_name['detections'].message_type = _DETECTION
+DESCRIPTOR.message_types_by_name['Tensor'] = _TENSOR
+DESCRIPTOR.message_types_by_name['BoundingBox'] = _BOUNDINGBOX
+DESCRIPTOR.message_types_by_name['DetectRequest'] = _DETECTREQUEST
+DESCRIPTOR.message_types_by_name['Detection'] = _DETECTION
+DESCRIPTOR.message_types_by_name['DetectResponse'] = _DETECTRESPONSE
+_sym_db.RegisterFileDescriptor(DESCRIPTOR)
+
+Tensor = _reflection.GeneratedProtocolMessageType('Tensor', (_message.Message,), {
+  'DESCRIPTOR' : _TENSOR,
+  '__module__' : 'protos.detector_pb2'
+  # @@protoc_insertion_point(class_scope:max.object_detector.Tensor)
+  })
+_sym_db.RegisterMessage(Tensor)
+
+BoundingBox = _reflection.GeneratedProtocolMessageType('BoundingBox', (_message.Message,), {
+  'DESCRIPTOR' : _BOUNDINGBOX,
+  '__module__' : 'protos.detector_pb2'
+  # @@protoc_insertion_point(class_scope:max.object_detector.BoundingBox)
+  })
+_sym_db.RegisterMessage(BoundingBox)
+
+DetectRequest = _reflection.GeneratedProtocolMessageType('DetectRequest', (_message.Message,), {
+  'DESCRIPTOR' : _DETECTREQUEST,
+  '__module__' : 'protos.detector_pb2'
+  # @@protoc_insertion_point(class_scope:max.object_detector.DetectRequest)
+  })
+_sym_db.RegisterMessage(DetectRequest)
+
+Detection = _reflection.GeneratedProtocolMessageType('Detection', (_message.Message,), {
+  'DESCRIPTOR' : _DETECTION,
+  '__module__' : 'protos.detector_pb2'
+  # @@protoc_insertion_point(class_scope:max.object_detector.Detection)
+  })
+_sym_db.RegisterMessage(Detection)
+
+DetectResponse = _reflection.GeneratedProtocolMessageType('DetectResponse', (_message.Message,), {
+  'DESCRIPTOR' : _DETECTRESPONSE,
+  '__module__' : 'protos.detector_pb2'
+  # @@protoc_insertion_point(class_scope:max.object_detector.DetectResponse)
+  })
+_sym_db.RegisterMessage(DetectResponse)
+
+
+
+_OBJECTDETECTOR = _descriptor.ServiceDescriptor(
+  name='ObjectDetector',
+  full_name='max.object_detector.ObjectDetector',
+  file=DESCRIPTOR,
+  index=0,
+  serialized_options=None,
+  create_key=_descriptor._internal_create_key,
+  serialized_start=655,
+  serialized_end=847,
+  methods=[
+  _descriptor.MethodDescriptor(
+    name='Detect',
+    full_name='max.object_detector.ObjectDetector.Detect',
+    index=0,
+    containing_service=None,
+    input_type=_DETECTREQUEST,
+    output_type=_DETECTRESPONSE,
+    serialized_options=None,
+    create_key=_descriptor._internal_create_key,
+  ),
+  _descriptor.MethodDescriptor(
+    name='DetectStream',
+    full_name='max.object_detector.ObjectDetector.DetectStream',
+    index=1,
+    containing_service=None,
+    input_type=_DETECTREQUEST,
+    output_type=_DETECTRESPONSE,
+    serialized_options=None,
+    create_key=_descriptor._internal_create_key,
+  ),
+])
+_sym_db.RegisterServiceDescriptor(_OBJECTDETECTOR)
+
+DESCRIPTOR.services_by_name['ObjectDetector'] = _OBJECTDETECTOR
+
+# @@protoc_insertion_point(module_scope)
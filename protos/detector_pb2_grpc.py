@@ -0,0 +1,103 @@
+# Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
+"""Client and server classes corresponding to protobuf-defined services."""
+import grpc
+
+from protos import detector_pb2 as protos_dot_detector__pb2
+
+
+class ObjectDetectorStub(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.Detect = channel.unary_unary(
+                '/max.object_detector.ObjectDetector/Detect',
+                request_serializer=protos_dot_detector__pb2.DetectRequest.SerializeToString,
+                response_deserializer=protos_dot_detector__pb2.DetectResponse.FromString,
+                )
+        self.DetectStream = channel.stream_stream(
+                '/max.object_detector.ObjectDetector/DetectStream',
+                request_serializer=protos_dot_detector__pb2.DetectRequest.SerializeToString,
+                response_deserializer=protos_dot_detector__pb2.DetectResponse.FromString,
+                )
+
+
+class ObjectDetectorServicer(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def Detect(self, request, context):
+        """Detect objects in a single image.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def DetectStream(self, request_iterator, context):
+        """Detect objects in a stream of frames. One response is sent for each request, in request
+        order. Frames that arrive while earlier ones are processed are run through the model together
+        as a batch. A frame that fails is reported in its response, and the stream stays open.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_ObjectDetectorServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'Detect': grpc.unary_unary_rpc_method_handler(
+                    servicer.Detect,
+                    request_deserializer=protos_dot_detector__pb2.DetectRequest.FromString,
+                    response_serializer=protos_dot_detector__pb2.DetectResponse.SerializeToString,
+            ),
+            'DetectStream': grpc.stream_stream_rpc_method_handler(
+                    servicer.DetectStream,
+                    request_deserializer=protos_dot_detector__pb2.DetectRequest.FromString,
+                    response_serializer=protos_dot_detector__pb2.DetectResponse.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'max.object_detector.ObjectDetector', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+
+
+ # This class is part of an EXPERIMENTAL API.
+class ObjectDetector(object):
+    """Missing associated documentation comment in .proto file."""
+
+    @staticmethod
+    def Detect(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/max.object_detector.ObjectDetector/Detect',
+            protos_dot_detector__pb2.DetectRequest.SerializeToString,
+            protos_dot_detector__pb2.DetectResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def DetectStream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(request_iterator, target, '/max.object_detector.ObjectDetector/DetectStream',
+            protos_dot_detector__pb2.DetectRequest.SerializeToString,
+            protos_dot_detector__pb2.DetectResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
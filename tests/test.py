@@ -14,9 +14,16 @@
 # limitations under the License.
 #
 
+import io
 import os
+import grpc
+import msgpack
 import pytest
 import requests
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from protos import detector_pb2, detector_pb2_grpc
 
 
 def test_swagger():
@@ -103,6 +110,280 @@ def test_predict():
     assert response['predictions'][child_index]['detection_box'][3] < 0.6
 
 
+def test_predict_tiled():
+    model_endpoint = 'http://localhost:5000/model/predict?tiled=true&tile_size=256&tile_overlap=0.25'
+    file_path = 'samples/baby-bear.jpg'
+
+    with open(file_path, 'rb') as file:
+        file_form = {'image': (file_path, file, 'image/jpeg')}
+        r = requests.post(url=model_endpoint, files=file_form)
+
+    assert r.status_code == 200
+    response = r.json()
+
+    assert response['status'] == 'ok'
+    assert '88' in [p['label_id'] for p in response['predictions']]
+    for prediction in response['predictions']:
+        assert all(0 <= coordinate <= 1 for coordinate in prediction['detection_box'])
+
+    # too many tiles
+    with open(file_path, 'rb') as file:
+        file_form = {'image': (file_path, file, 'image/jpeg')}
+        r = requests.post(url='http://localhost:5000/model/predict?tiled=true&tile_size=32&tile_overlap=0.9',
+                          files=file_form)
+
+    assert r.status_code == 400
+
+
+def test_predict_roi():
+    model_endpoint = 'http://localhost:5000/model/predict'
+    file_path = 'samples/baby-bear.jpg'
+    roi = [0.2, 0.45, 0.75, 0.95]
+
+    with open(file_path, 'rb') as file:
+        file_form = {'image': (file_path, file, 'image/jpeg')}
+        r = requests.post(url=model_endpoint, files=file_form, data={'roi': ','.join(map(str, roi))})
+
+    assert r.status_code == 200
+    response = r.json()
+
+    assert response['status'] == 'ok'
+    assert '88' in [p['label_id'] for p in response['predictions']]
+    for prediction in response['predictions']:
+        ymin, xmin, ymax, xmax = prediction['detection_box']
+        assert roi[0] - 0.01 <= ymin and ymax <= roi[2] + 0.01
+        assert roi[1] - 0.01 <= xmin and xmax <= roi[3] + 0.01
+
+    with open(file_path, 'rb') as file:
+        file_form = {'image': (file_path, file, 'image/jpeg')}
+        r = requests.post(url=model_endpoint, files=file_form, data={'roi': '0.5,0.5,0.2,0.9'})
+
+    assert r.status_code == 400
+
+    # too many regions
+    with open(file_path, 'rb') as file:
+        file_form = {'image': (file_path, file, 'image/jpeg')}
+        r = requests.post(url=model_endpoint, files=file_form, data={'roi': ['0,0,1,1'] * 17})
+
+    assert r.status_code == 400
+
+
+def test_predict_columnar_formats():
+    model_endpoint = 'http://localhost:5000/model/predict'
+    file_path = 'samples/baby-bear.jpg'
+
+    with open(file_path, 'rb') as file:
+        file_form = {'image': (file_path, file, 'image/jpeg')}
+        r = requests.post(url=model_endpoint, files=file_form,
+                          headers={'Accept': 'application/vnd.max.columnar+json'})
+
+    assert r.status_code == 200
+    assert r.headers['Content-Type'] == 'application/vnd.max.columnar+json'
+    response = r.json()
+
+    assert response['status'] == 'ok'
+    assert response['count'] == len(response['label_ids']) == len(response['labels'])
+    assert len(response['detection_boxes']) == 4 * response['count']
+    assert frozenset(response['label_ids']) == frozenset((1, 88))
+
+    with open(file_path, 'rb') as file:
+        file_form = {'image': (file_path, file, 'image/jpeg')}
+        r = requests.post(url=model_endpoint, files=file_form, headers={'Accept': 'application/x-msgpack'})
+
+    assert r.status_code == 200
+    assert r.headers['Content-Type'] == 'application/x-msgpack'
+    response = msgpack.unpackb(r.content)
+
+    assert response['status'] == 'ok'
+    assert frozenset(response['labels']) == frozenset(('person', 'teddy bear'))
+    assert len(response['detection_boxes']) == 16 * response['count']
+
+
+def test_predict_raw_tensor():
+    model_endpoint = 'http://localhost:5000/model/predict'
+    image = Image.open('samples/baby-bear.jpg').convert('RGB')
+    shape = '{},{}'.format(image.height, image.width)
+
+    r = requests.post(url=model_endpoint, files={'tensor': ('tensor', image.tobytes())}, data={'image_shape': shape})
+
+    assert r.status_code == 200
+    response = r.json()
+
+    assert response['status'] == 'ok'
+    assert frozenset(p['label_id'] for p in response['predictions']) == frozenset(('1', '88'))
+
+    r = requests.post(url=model_endpoint, files={'tensor': ('tensor', image.tobytes()[1:])}, data={'image_shape': shape})
+    assert r.status_code == 400
+
+    r = requests.post(url=model_endpoint, data={'image_path': '/etc/passwd'})
+    assert r.status_code == 403
+
+
+def test_predict_deadline():
+    model_endpoint = 'http://localhost:5000/model/predict'
+    file_path = 'samples/baby-bear.jpg'
+
+    with open(file_path, 'rb') as file:
+        file_form = {'image': (file_path, file, 'image/jpeg')}
+        r = requests.post(url=model_endpoint, files=file_form, headers={'X-Request-Deadline-Ms': '0'})
+
+    assert r.status_code == 504
+    assert r.json()['status'] == 'error'
+
+    with open(file_path, 'rb') as file:
+        file_form = {'image': (file_path, file, 'image/jpeg')}
+        r = requests.post(url=model_endpoint, files=file_form, data={'deadline': 10000000000000})
+
+    assert r.status_code == 400
+
+    with open(file_path, 'rb') as file:
+        file_form = {'image': (file_path, file, 'image/jpeg')}
+        r = requests.post(url=model_endpoint, files=file_form, headers={'X-Request-Deadline-Ms': 'soon'})
+
+    assert r.status_code == 400
+
+
+def test_predict_priority():
+    model_endpoint = 'http://localhost:5000/model/predict'
+    file_path = 'samples/baby-bear.jpg'
+
+    with open(file_path, 'rb') as file:
+        file_form = {'image': (file_path, file, 'image/jpeg')}
+        r = requests.post(url=model_endpoint, files=file_form, headers={'X-Priority': 'bulk'})
+
+    assert r.status_code == 200
+    assert r.json()['status'] == 'ok'
+
+    with open(file_path, 'rb') as file:
+        file_form = {'image': (file_path, file, 'image/jpeg')}
+        r = requests.post(url=model_endpoint, files=file_form, headers={'X-Priority': 'unknown'})
+
+    assert r.status_code == 400
+
+
+def test_predict_batch():
+    model_endpoint = 'http://localhost:5000/model/predict/batch'
+
+    # URLs that cannot be fetched fail individually without failing the batch
+    urls = ['ftp://localhost/samples/dog-human.jpg', 'http://localhost:1/dog-human.jpg']
+    r = requests.post(url=model_endpoint, data={'image_url': urls})
+    assert r.status_code == 200
+    response = r.json()
+    assert response['status'] == 'ok'
+    assert [result['image_url'] for result in response['results']] == urls
+    assert all(result['status'] == 'error' and result['message'] for result in response['results'])
+
+    r = requests.post(url=model_endpoint)
+    assert r.status_code == 400
+
+
+def test_predict_stream():
+    model_endpoint = 'http://localhost:5000/model/predict'
+    file_path = 'samples/dog-human.jpg'
+    stream_id = 'test-{}'.format(uuid.uuid4())
+
+    responses = []
+    for _ in range(2):
+        with open(file_path, 'rb') as file:
+            file_form = {'image': (file_path, file, 'image/jpeg')}
+            responses.append(requests.post(url=model_endpoint, files=file_form, data={'stream_id': stream_id}))
+
+    # the repeated frame is answered with the detections of the first one without running the model
+    assert [r.status_code for r in responses] == [200, 200]
+    assert [r.headers['X-Frame-Skipped'] for r in responses] == ['false', 'true']
+    assert responses[0].json()['predictions'] == responses[1].json()['predictions']
+
+    with open(file_path, 'rb') as file:
+        file_form = {'image': (file_path, file, 'image/jpeg')}
+        r = requests.post(url=model_endpoint, files=file_form, data={'stream_id': stream_id, 'threshold': 0.5})
+    assert r.headers['X-Frame-Skipped'] == 'false'
+
+
+def test_stats():
+    model_endpoint = 'http://localhost:5000/model/stats'
+    file_path = 'samples/baby-bear.jpg'
+
+    # a request that expires in the queue
+    with open(file_path, 'rb') as file:
+        file_form = {'image': (file_path, file, 'image/jpeg')}
+        requests.post(url='http://localhost:5000/model/predict', files=file_form,
+                      headers={'X-Request-Deadline-Ms': '0'})
+
+    # a stream frame that is skipped
+    stream_id = 'test-{}'.format(uuid.uuid4())
+    for _ in range(2):
+        with open(file_path, 'rb') as file:
+            file_form = {'image': (file_path, file, 'image/jpeg')}
+            requests.post(url='http://localhost:5000/model/predict', files=file_form, data={'stream_id': stream_id})
+
+    r = requests.get(url=model_endpoint)
+    assert r.status_code == 200
+
+    queue = r.json()['queue']
+    assert queue['concurrency'] > 0
+    assert frozenset(lane['name'] for lane in queue['lanes']) == frozenset(('interactive', 'bulk'))
+    assert queue['expired'] >= 1
+    assert queue['admitted'] >= queue['completed']
+
+    streams = r.json()['streams']
+    assert streams['skipped'] >= 1
+    assert streams['frames'] == streams['skipped'] + streams['inferred']
+
+
+def test_predict_too_large():
+    model_endpoint = 'http://localhost:5000/model/predict'
+
+    # a 9000x9000 PNG of a few kilobytes is rejected from its header without being decoded
+    file = io.BytesIO()
+    Image.new('1', (9000, 9000)).save(file, 'PNG')
+    file_form = {'image': ('large.png', file.getvalue(), 'image/png')}
+    r = requests.post(url=model_endpoint, files=file_form)
+    assert r.status_code == 413
+
+    r = requests.get(url='http://localhost:5000/model/stats')
+    memory = r.json()['memory']
+    assert memory['reserved_bytes'] >= 0
+    assert memory['peak_rss_bytes'] > 0
+
+
+def test_grpc_detect():
+    stub = detector_pb2_grpc.ObjectDetectorStub(grpc.insecure_channel('localhost:50051'))
+
+    with open('samples/dog-human.jpg', 'rb') as file:
+        image = file.read()
+
+    response = stub.Detect(detector_pb2.DetectRequest(image=image, threshold=0.5, frame_id=1), timeout=30)
+    assert response.frame_id == 1
+    assert {detection.label for detection in response.detections} >= {'person', 'dog'}
+    assert all(0 <= detection.box.ymin < detection.box.ymax <= 1 for detection in response.detections)
+
+    # frames of a stream are answered in order, and a failed frame does not end the stream
+    frames = [detector_pb2.DetectRequest(image=image if i != 1 else b'x', frame_id=i) for i in range(3)]
+    responses = list(stub.DetectStream(iter(frames), timeout=30))
+    assert [r.frame_id for r in responses] == [0, 1, 2]
+    assert [r.error_code for r in responses] == [0, grpc.StatusCode.INVALID_ARGUMENT.value[0], 0]
+    assert responses[0].detections == responses[2].detections
+
+    with pytest.raises(grpc.RpcError) as e:
+        stub.Detect(detector_pb2.DetectRequest(), timeout=30)
+    assert e.value.code() == grpc.StatusCode.INVALID_ARGUMENT
+
+
+def test_grpc_detect_without_deadline():
+    stub = detector_pb2_grpc.ObjectDetectorStub(grpc.insecure_channel('localhost:50051'))
+
+    with open('samples/dog-human.jpg', 'rb') as file:
+        image = file.read()
+
+    # calls without a client deadline wait for the inferences that are already running
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        tiled = executor.submit(requests.post, 'http://localhost:5000/model/predict?tiled=true&tile_size=128',
+                                files={'image': ('dog-human.jpg', image, 'image/jpeg')})
+        calls = [executor.submit(stub.Detect, detector_pb2.DetectRequest(image=image, frame_id=i)) for i in range(3)]
+        assert [call.result().frame_id for call in calls] == [0, 1, 2]
+        assert tiled.result().status_code == 200
+
+
 def test_predict_non_image():
     model_endpoint = 'http://localhost:5000/model/predict'
     file_path = 'requirements.txt'
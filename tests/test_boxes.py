@@ -0,0 +1,109 @@
+#
+# Copyright 2018-2019 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import numpy as np
+import pytest
+
+from core.boxes import (tile_windows, windows_to_image, non_max_suppression, normalized_to_windows,
+                        parse_region_of_interest, fit_within)
+
+
+def reference_nms(boxes, scores, classes, iou_threshold):
+    """Plain greedy NMS, one box at a time."""
+    def iou(a, b):
+        height = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+        width = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+        intersection = height * width
+        union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+        return intersection / union
+
+    keep = []
+    for i in sorted(range(len(scores)), key=lambda i: -scores[i]):
+        if all(classes[i] != classes[j] or iou(boxes[i], boxes[j]) <= iou_threshold for j in keep):
+            keep.append(i)
+    return keep
+
+
+def random_boxes(rng, count):
+    corners = rng.uniform(0, 1, (count, 2, 2))
+    size = rng.uniform(0.05, 0.3, (count, 1, 2))
+    return np.concatenate([corners[:, 0], corners[:, 0] + size[:, 0]], axis=1).astype(np.float32)
+
+
+def test_tile_windows_cover_image():
+    windows = tile_windows(100, 250, 64, 0.25)
+    assert (windows[:, 2:] - windows[:, :2] == 64).all()
+    assert windows.min() == 0
+    assert windows[:, 2].max() == 100 and windows[:, 3].max() == 250
+    covered = np.zeros((100, 250), dtype=bool)
+    for ymin, xmin, ymax, xmax in windows:
+        covered[ymin:ymax, xmin:xmax] = True
+    assert covered.all()
+
+
+def test_tile_windows_small_image():
+    np.testing.assert_array_equal(tile_windows(20, 40, 64, 0.25), [[0, 0, 20, 40]])
+
+
+def test_tile_windows_limit():
+    assert len(tile_windows(256, 256, 64, 0.5, max_tiles=49)) == 49
+    with pytest.raises(ValueError):
+        tile_windows(256, 256, 64, 0.5, max_tiles=48)
+    # rejected without enumerating the millions of windows
+    with pytest.raises(ValueError):
+        tile_windows(8192, 8192, 32, 0.9, max_tiles=256)
+
+
+def test_fit_within():
+    assert fit_within(4320, 7680, 512) == (288, 512)
+    assert fit_within(300, 200, 512) == (300, 200)
+    assert fit_within(10000, 1, 512) == (512, 1)
+
+
+def test_windows_to_image():
+    boxes = np.array([[[0, 0, 1, 1], [0.5, 0.5, 1, 1]]], dtype=np.float32)
+    mapped = windows_to_image(boxes, [[50, 100, 100, 200]], 100, 200)
+    np.testing.assert_allclose(mapped, [[[0.5, 0.5, 1, 1], [0.75, 0.75, 1, 1]]])
+
+
+def test_non_max_suppression_matches_reference():
+    rng = np.random.RandomState(0)
+    boxes = random_boxes(rng, 600)
+    scores = rng.uniform(0, 1, 600).astype(np.float32)
+    classes = rng.randint(0, 3, 600)
+    keep = non_max_suppression(boxes, scores, classes, 0.5, block_size=32)
+    assert keep.tolist() == reference_nms(boxes, scores, classes, 0.5)
+
+
+def test_non_max_suppression_separates_classes():
+    boxes = np.array([[0, 0, 1, 1]] * 3, dtype=np.float32)
+    scores = np.array([0.9, 0.8, 0.7], dtype=np.float32)
+    # large class ids must not collide
+    classes = np.array([4000, 4001, 4000])
+    assert non_max_suppression(boxes, scores, classes, 0.5).tolist() == [0, 1]
+
+
+def test_normalized_to_windows():
+    windows = normalized_to_windows([[0.1, 0.2, 0.5, 0.6], [1, 1, 1, 1]], 10, 20)
+    np.testing.assert_array_equal(windows, [[1, 4, 5, 12], [9, 19, 10, 20]])
+
+
+def test_parse_region_of_interest():
+    assert parse_region_of_interest('0,0.1,0.5,1') == [0, 0.1, 0.5, 1]
+    with pytest.raises(ValueError):
+        parse_region_of_interest('0.5,0,0.5,1')
+    with pytest.raises(ValueError):
+        parse_region_of_interest('0,0,1')
@@ -0,0 +1,94 @@
+#
+# Copyright 2018-2019 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import numpy as np
+import pytest
+
+from core.buckets import ShapeBuckets, bucket_to_image
+
+SHAPES = [(512, 512), (320, 320), (320, 640)]
+
+
+def test_select():
+    buckets = ShapeBuckets(SHAPES, 'letterbox', 4)
+    assert buckets.shapes == [(320, 320), (320, 640), (512, 512)]
+    assert buckets.select(300, 200) == (320, 320)
+    assert buckets.select(300, 600) == (320, 640)
+    assert buckets.select(400, 400) == (512, 512)
+    # larger than every bucket
+    assert buckets.select(1000, 2000) == (512, 512)
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        ShapeBuckets(SHAPES, 'crop', 4)
+
+
+def test_batch_sizes():
+    buckets = ShapeBuckets(SHAPES, 'letterbox', 4, max_batch_pixels=512 * 512)
+    assert buckets.batch_sizes == {(320, 320): 2, (320, 640): 1, (512, 512): 1}
+    with buckets.buffer((320, 320)) as buffer:
+        assert buffer.shape == (2, 320, 320, 3) and buffer.dtype == np.uint8
+
+
+def test_letterbox_fill():
+    buckets = ShapeBuckets(SHAPES, 'letterbox', 2)
+    buffer = np.full((2, 512, 512, 3), 7, dtype=np.uint8)
+    image = np.full((200, 300, 3), 255, dtype=np.uint8)
+    assert buckets.fill(buffer, 0, (512, 512), image) == (200, 300)
+    assert (buffer[0, :200, :300] == 255).all()
+    assert buffer[0, 200:].sum() == 0 and buffer[0, :, 300:].sum() == 0
+    assert (buffer[1] == 7).all()
+
+    # scaled down, keeping the aspect ratio
+    image = np.full((1024, 512, 3), 255, dtype=np.uint8)
+    assert buckets.fill(buffer, 1, (512, 512), image) == (512, 256)
+    assert (buffer[1, :, :256] == 255).all() and buffer[1, :, 256:].sum() == 0
+
+
+def test_resize_fill():
+    buckets = ShapeBuckets(SHAPES, 'resize', 1)
+    buffer = np.zeros((1, 320, 640, 3), dtype=np.uint8)
+    image = np.full((100, 100, 3), 255, dtype=np.uint8)
+    assert buckets.fill(buffer, 0, (320, 640), image) == (320, 640)
+    assert (buffer == 255).all()
+
+
+def test_bucket_to_image():
+    buckets = ShapeBuckets(SHAPES, 'letterbox', 2)
+    content_shapes = [buckets.content_shape((512, 512), 256, 128), buckets.content_shape((512, 512), 1024, 1024)]
+    assert content_shapes == [(256, 128), (512, 512)]
+    boxes = np.array([[[0, 0, 0.5, 0.25], [0.25, 0.125, 0.5, 0.5]],
+                      [[0, 0, 0.5, 0.25], [0.25, 0.125, 0.5, 0.5]]], dtype=np.float32)
+    scores = np.array([[0.9, 0.8], [0.7, 0.6]], dtype=np.float32)
+    mapped, mapped_scores = bucket_to_image(boxes, scores, (512, 512), content_shapes)
+    np.testing.assert_allclose(mapped[0], [[0, 0, 1, 1], [0.5, 0.5, 1, 1]])
+    np.testing.assert_allclose(mapped[1], boxes[1])
+    np.testing.assert_array_equal(mapped_scores, scores)
+
+
+def test_bucket_to_image_drops_padding():
+    # a 600x100 image letterboxed into a 640x640 bucket
+    buckets = ShapeBuckets([(640, 640)], 'letterbox', 1)
+    content_shape = buckets.content_shape((640, 640), 600, 100)
+    assert content_shape == (600, 100)
+    boxes = np.array([[[0.25, 0.2, 0.75, 0.5], [0.25, 0.05, 0.75, 0.1], [0.25, 0.1, 0.75, 0.3]]], dtype=np.float32)
+    scores = np.array([[0.9, 0.8, 0.7]], dtype=np.float32)
+    mapped, mapped_scores = bucket_to_image(boxes, scores, (640, 640), [content_shape])
+    # the first box lies entirely in the padding to the right of the image, the third only partly
+    np.testing.assert_allclose(mapped_scores, [[0, 0.8, 0.7]])
+    np.testing.assert_allclose(mapped[0, 0], [0.2667, 1, 0.8, 1], atol=1e-3)
+    np.testing.assert_allclose(mapped[0, 2], [0.2667, 0.64, 0.8, 1], atol=1e-3)
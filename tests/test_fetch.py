@@ -0,0 +1,144 @@
+#
+# Copyright 2018-2021 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.fetch import ImageFetcher, FetchError, MAX_REDIRECTS, is_public_address
+
+BODY = b'\x89PNG' * 100
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.startswith('/redirect/'):
+            self.send_response(302)
+            location = self.path[len('/redirect/'):].replace('~', '/')
+            self.send_header('Location', location if location.startswith('http') else '/' + location)
+            self.end_headers()
+            return
+        if self.path.startswith('/drip'):
+            # a hostile server that sends one byte at a time
+            if self.path == '/drip-headers':
+                self.wfile.write(b'HTTP/1.1 200 OK\r\n')
+                for _ in range(40):
+                    self.wfile.write(b'X')
+                    self.wfile.flush()
+                    time.sleep(0.05)
+                return
+            self.send_response(200)
+            if self.path == '/drip':
+                self.send_header('Content-Length', str(len(BODY)))
+            self.end_headers()
+            for byte in BODY[:40]:
+                self.wfile.write(bytes([byte]))
+                self.wfile.flush()
+                time.sleep(0.05)
+            return
+        if self.path == '/missing':
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', 'not a number' if self.path == '/bad-length' else str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}'.format(server.server_address[1])
+    server.shutdown()
+
+
+def fetcher(allowed_hosts=('127.0.0.1',), per_host=2, max_bytes=1024, timeout=5):
+    return ImageFetcher(4, per_host, max_bytes, timeout, allowed_hosts)
+
+
+def test_fetch(server):
+    assert fetcher().fetch(server + '/image.png') == BODY
+    # a malformed Content-Length is ignored, the body is still limited
+    assert fetcher().fetch(server + '/bad-length') == BODY
+    with pytest.raises(FetchError):
+        fetcher(max_bytes=100).fetch(server + '/bad-length')
+
+
+def test_fetch_private_address_blocked(server):
+    with pytest.raises(FetchError) as blocked:
+        fetcher(allowed_hosts=None).fetch(server + '/image.png')
+    with pytest.raises(FetchError) as missing:
+        fetcher().fetch(server + '/missing')
+    # failures cannot be told apart by clients
+    assert str(blocked.value).replace('/image.png', '') == str(missing.value).replace('/missing', '')
+
+
+def test_fetch_redirects(server):
+    assert fetcher().fetch(server + '/redirect/image.png') == BODY
+    # every hop is checked against the allowed hosts
+    target = server.replace('127.0.0.1', 'localhost').replace('/', '~')
+    with pytest.raises(FetchError, match='not allowed'):
+        fetcher().fetch(server + '/redirect/' + target + '~image.png')
+    with pytest.raises(FetchError):
+        fetcher().fetch(server + '/redirect' * (MAX_REDIRECTS + 1) + '/image.png')
+
+
+def test_fetch_waits_for_host_within_timeout(server):
+    image_fetcher = fetcher(per_host=1, timeout=0.2)
+    assert image_fetcher._acquire_host('127.0.0.1', 0)
+    start = time.monotonic()
+    with pytest.raises(FetchError):
+        image_fetcher.fetch(server + '/image.png')
+    assert time.monotonic() - start < 1
+
+    image_fetcher._release_host('127.0.0.1')
+    assert image_fetcher.fetch(server + '/image.png') == BODY
+    # idle hosts are forgotten
+    assert image_fetcher._host_slots == {}
+
+
+@pytest.mark.parametrize('path', ['/drip', '/drip-body', '/drip-headers'])
+def test_fetch_slow_drip_times_out(server, path):
+    image_fetcher = fetcher(timeout=0.5)
+    start = time.monotonic()
+    with pytest.raises(FetchError):
+        image_fetcher.fetch(server + path)
+    assert time.monotonic() - start < 1
+    # the connection pool still works afterwards
+    assert image_fetcher.fetch(server + '/image.png') == BODY
+
+
+def test_fetch_all(server):
+    results = fetcher().fetch_all([server + '/image.png', 'ftp://example.com/image.png'])
+    assert results[0] == BODY
+    assert isinstance(results[1], FetchError)
+
+
+def test_is_public_address():
+    assert is_public_address('93.184.216.34')
+    assert is_public_address('2606:2800:220:1:248:1893:25c8:1946')
+    for address in ['127.0.0.1', '10.1.2.3', '192.168.0.1', '169.254.169.254', '0.0.0.0', '::1', 'fe80::1%eth0',
+                    '::ffff:127.0.0.1', 'fd00::1', '224.0.0.1']:
+        assert not is_public_address(address)
@@ -0,0 +1,59 @@
+#
+# Copyright 2018-2021 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import io
+
+import numpy as np
+import pytest
+
+from core.inputs import parse_image_shape, tensor_from_bytes, load_shared_tensor
+
+
+def npy(array):
+    data = io.BytesIO()
+    np.save(data, array)
+    return data.getvalue()
+
+
+def test_tensor_from_bytes():
+    image = np.arange(4 * 5 * 3, dtype=np.uint8).reshape(4, 5, 3)
+    np.testing.assert_array_equal(tensor_from_bytes(npy(image)), image)
+    np.testing.assert_array_equal(tensor_from_bytes(image.tobytes(), parse_image_shape('4,5')), image)
+    with pytest.raises(ValueError):
+        tensor_from_bytes(npy(image.astype(np.float32)))
+    with pytest.raises(ValueError):
+        tensor_from_bytes(image.tobytes(), parse_image_shape('5,5'))
+
+
+@pytest.mark.parametrize('shape', [(0, 5, 3), (5, 0, 3)])
+def test_empty_tensor_rejected(shape, tmp_path):
+    with pytest.raises(ValueError):
+        tensor_from_bytes(npy(np.zeros(shape, dtype=np.uint8)))
+    path = str(tmp_path / 'empty.npy')
+    np.save(path, np.zeros(shape, dtype=np.uint8))
+    with pytest.raises(ValueError):
+        load_shared_tensor(path, [str(tmp_path)])
+    with pytest.raises(ValueError):
+        parse_image_shape(','.join(map(str, shape)))
+
+
+def test_shared_tensor_outside_allowed_dirs(tmp_path):
+    path = str(tmp_path / 'image.npy')
+    np.save(path, np.zeros((2, 2, 3), dtype=np.uint8))
+    np.testing.assert_array_equal(load_shared_tensor(path, [str(tmp_path)]), np.zeros((2, 2, 3)))
+    with pytest.raises(PermissionError):
+        load_shared_tensor(path, [str(tmp_path / 'other')])
@@ -0,0 +1,88 @@
+#
+# Copyright 2018-2019 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+
+import numpy as np
+import pytest
+
+from utils import label_map_util
+
+LABEL_MAP = '''
+item {
+  name: "/m/01g317"
+  id: 1
+  display_name: "person"
+}
+item {
+  name: "/m/0199g"
+  id: 300
+  display_name: "bicycle"
+}
+'''
+
+
+@pytest.fixture
+def label_map_path(tmp_path):
+    path = tmp_path / 'label_map.pbtxt'
+    path.write_text(LABEL_MAP)
+    return str(path)
+
+
+def test_create_label_name_table_large_ids(label_map_path):
+    label_map = label_map_util.load_labelmap(label_map_path)
+    categories = label_map_util.convert_label_map_to_categories(label_map, 1000)
+    label_names = label_map_util.create_label_name_table(categories)
+
+    assert len(label_names) == 301
+    classes = np.array([300, 1, 44], dtype=np.int32)
+    assert label_names[classes].tolist() == ['bicycle', 'person', 'N/A']
+
+
+def test_load_labelmap_cached(label_map_path, tmp_path):
+    cache_path = str(tmp_path / 'label_map.pb')
+    label_map = label_map_util.load_labelmap_cached(label_map_path, cache_path)
+    assert [item.id for item in label_map.item] == [1, 300]
+    # no temporary file is left behind
+    assert sorted(os.listdir(str(tmp_path))) == ['label_map.pb', 'label_map.pbtxt']
+    assert label_map_util.load_labelmap_cached(label_map_path, cache_path) == label_map
+
+
+def test_load_labelmap_corrupt_cache(label_map_path, tmp_path):
+    cache_path = str(tmp_path / 'label_map.pb')
+    label_map = label_map_util.load_labelmap_cached(label_map_path, cache_path)
+    with open(cache_path, 'rb') as fid:
+        cache = fid.read()
+    with open(cache_path, 'wb') as fid:
+        fid.write(cache[:32] + b'\xff\xff\xff')
+
+    assert label_map_util.load_labelmap_cached(label_map_path, cache_path) == label_map
+    with open(cache_path, 'rb') as fid:
+        assert fid.read() == cache
+
+
+def test_load_labelmap_stale_cache(label_map_path, tmp_path):
+    cache_path = str(tmp_path / 'label_map.pb')
+    label_map_util.load_labelmap_cached(label_map_path, cache_path)
+
+    # a new label map copied in with its older modification time preserved
+    with open(label_map_path, 'w') as fid:
+        fid.write(LABEL_MAP.replace('bicycle', 'car'))
+    os.utime(label_map_path, (0, 0))
+
+    label_map = label_map_util.load_labelmap_cached(label_map_path, cache_path)
+    assert [item.display_name for item in label_map.item] == ['person', 'car']
+    assert label_map_util.load_labelmap_cached(label_map_path, cache_path) == label_map
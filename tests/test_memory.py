@@ -0,0 +1,40 @@
+#
+# Copyright 2018-2021 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import threading
+import time
+
+import pytest
+
+from core.memory import MemoryBudget, MemoryBudgetExceededError
+
+
+def test_reserve_waits_for_release():
+    budget = MemoryBudget(10, wait_timeout=0.1)
+    budget.acquire(8)
+    with pytest.raises(MemoryBudgetExceededError):
+        budget.acquire(4)
+
+    # a deadline too far away for a condition wait is still honoured
+    waiter = threading.Thread(target=budget.acquire, args=(4, time.monotonic() + 9.2e18))
+    waiter.start()
+    time.sleep(0.05)
+    assert waiter.is_alive()
+    budget.release(8)
+    waiter.join(1)
+    assert not waiter.is_alive()
+    assert budget.stats()['reserved_bytes'] == 4
+    assert budget.stats()['rejected'] == 1
@@ -0,0 +1,82 @@
+#
+# Copyright 2018-2019 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import io
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import core.pipeline
+from core.pipeline import Pipeline, decode_image
+
+
+def encode(image):
+    data = io.BytesIO()
+    Image.fromarray(image).save(data, 'PNG')
+    return data.getvalue()
+
+
+def crash_once(image_data):
+    """Kill the worker process the first time it is called, as the OOM killer would.
+
+    The worker imports this module afresh, so the marker file recording the crash is passed along
+    with the image, separated by a NUL byte.
+    """
+    marker, _, image_data = image_data.partition(b'\0')
+    try:
+        os.close(os.open(marker, os.O_CREAT | os.O_EXCL))
+    except FileExistsError:
+        return decode_image(image_data)
+    os._exit(1)
+
+
+@pytest.mark.parametrize('executor', ['thread', 'process'])
+def test_decode(executor):
+    pipeline = Pipeline(executor, 2, 1)
+    image = np.arange(48 * 64 * 3, dtype=np.uint8).reshape(48, 64, 3)
+    np.testing.assert_array_equal(pipeline.decode(encode(image)).result(), image)
+    with pytest.raises(IOError):
+        pipeline.decode(b'not an image').result()
+    assert pipeline.infer(sum, [1, 2]).result() == 3
+
+
+def test_decode_replaces_broken_pool():
+    pipeline = Pipeline('process', 2, 1)
+    image = np.zeros((8, 8, 3), dtype=np.uint8)
+    broken_pool = pipeline.decode_pool
+    with pytest.raises(BrokenProcessPool):
+        broken_pool.submit(os._exit, 1).result()
+
+    np.testing.assert_array_equal(pipeline.decode(encode(image)).result(), image)
+    assert pipeline.decode_pool is not broken_pool
+
+
+def test_decode_retries_when_worker_dies(monkeypatch, tmp_path):
+    marker = str(tmp_path / 'crashed')
+    monkeypatch.setattr(core.pipeline, 'decode_image', crash_once)
+    pipeline = Pipeline('process', 2, 1)
+    image = np.zeros((8, 8, 3), dtype=np.uint8)
+
+    np.testing.assert_array_equal(pipeline.decode(marker.encode() + b'\0' + encode(image)).result(), image)
+    assert os.path.exists(marker)
+
+
+def test_workers_are_not_forked_from_the_server():
+    pipeline = Pipeline('process', 1, 1)
+    assert pipeline.decode_pool.submit(os.getppid).result() != os.getpid()
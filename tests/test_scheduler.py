@@ -0,0 +1,122 @@
+#
+# Copyright 2018-2019 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import threading
+import time
+
+import pytest
+
+from core.scheduler import InferenceQueue, DeadlineExceededError, QueueFullError, deadline_after
+
+LANES = {'interactive': {'weight': 3, 'max_depth': 8}, 'bulk': {'weight': 1, 'max_depth': 8}}
+
+
+def test_admit_full_lane():
+    queue = InferenceQueue({'interactive': {'weight': 1, 'max_depth': 1}}, 1, 'interactive')
+    with queue.admit():
+        with pytest.raises(QueueFullError):
+            with queue.admit():
+                pass
+    assert queue.stats()['rejected'] == 1
+    assert queue.stats()['queued'] == 0
+
+
+def test_slot_grants_by_weight():
+    queue = InferenceQueue(LANES, 1, 'interactive')
+    order = []
+    ready = threading.Barrier(9)
+
+    def request(lane):
+        with queue.admit(lane) as ticket:
+            ready.wait()
+            with queue.slot(ticket):
+                order.append(lane)
+                time.sleep(0.001)
+
+    # hold the only slot until all requests are waiting, so that they are granted by weight
+    with queue.admit() as ticket, queue.slot(ticket):
+        threads = [threading.Thread(target=request, args=(lane,)) for lane in ['interactive'] * 4 + ['bulk'] * 4]
+        for thread in threads:
+            thread.start()
+        ready.wait()
+        while sum(len(lane.waiters) for lane in queue.lanes.values()) < 8:
+            time.sleep(0.001)
+    for thread in threads:
+        thread.join()
+
+    assert order[:4].count('interactive') == 3
+    stats = queue.stats()
+    assert (stats['running'], stats['queued'], stats['completed']) == (0, 0, 9)
+
+
+def test_slot_deadline_expires():
+    queue = InferenceQueue(LANES, 1, 'interactive')
+    with queue.admit() as ticket, queue.slot(ticket):
+        with queue.admit(deadline=time.monotonic() + 0.01) as waiting:
+            with pytest.raises(DeadlineExceededError):
+                with queue.slot(waiting):
+                    pass
+    stats = queue.stats()
+    assert (stats['expired'], stats['running'], stats['queued']) == (1, 0, 0)
+    assert not queue.lanes['interactive'].waiters
+
+
+def test_slot_released_when_wait_fails():
+    queue = InferenceQueue(LANES, 1, 'interactive')
+    wait = queue._cond.wait
+
+    def interrupted_wait(timeout=None):
+        queue._cond.wait = wait
+        raise KeyboardInterrupt()
+
+    with queue.admit() as ticket, queue.slot(ticket):
+        queue._cond.wait = interrupted_wait
+        with queue.admit() as waiting:
+            with pytest.raises(KeyboardInterrupt):
+                with queue.slot(waiting):
+                    pass
+    assert not queue.lanes['interactive'].waiters
+
+    # the slot is still available to later requests
+    with queue.admit(deadline=time.monotonic() + 1) as ticket, queue.slot(ticket):
+        assert queue.stats()['running'] == 1
+    assert queue.stats()['running'] == 0
+
+
+def test_far_deadline_waits():
+    queue = InferenceQueue(LANES, 1, 'interactive')
+    granted = threading.Event()
+
+    def request():
+        with queue.admit(deadline=time.monotonic() + 1e13) as ticket, queue.slot(ticket):
+            granted.set()
+
+    with queue.admit() as ticket, queue.slot(ticket):
+        thread = threading.Thread(target=request)
+        thread.start()
+        time.sleep(0.05)
+    thread.join(1)
+    assert granted.is_set()
+    assert queue.stats()['running'] == 0
+
+
+def test_deadline_after():
+    assert deadline_after(10.0, None) is None
+    assert deadline_after(10.0, 500) == 10.5
+    with pytest.raises(ValueError):
+        deadline_after(10.0, 10000000000000)
+    with pytest.raises(ValueError):
+        deadline_after(10.0, -1)
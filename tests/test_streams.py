@@ -0,0 +1,60 @@
+#
+# Copyright 2018-2021 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import numpy as np
+
+from core.streams import StreamCache
+
+DETECTIONS = {'detection_boxes': np.zeros((0, 4), dtype=np.float32)}
+
+
+def frame(seed=0):
+    """A 720p frame of a static scene with a little sensor noise."""
+    scene = np.tile(np.linspace(40, 200, 1280, dtype=np.float32), (720, 1))[:, :, None].repeat(3, axis=2)
+    noise = np.random.RandomState(seed).randint(-3, 4, scene.shape)
+    return np.clip(scene + noise, 0, 255).astype(np.uint8)
+
+
+def inferred(cache, stream_id, image, params=None):
+    """Look a frame up, storing it as inferred when it is not skipped; returns whether it was inferred."""
+    detections, frame_fingerprint = cache.lookup(stream_id, image, params)
+    if detections is None:
+        cache.store(stream_id, frame_fingerprint, params, DETECTIONS)
+    return detections is None
+
+
+def test_unchanged_frames_skipped():
+    cache = StreamCache(4, 32, 0.04, 2, 5.0)
+    assert inferred(cache, 'cam', frame(0))
+    assert [inferred(cache, 'cam', frame(seed)) for seed in range(1, 5)] == [False, False, True, False]
+    assert inferred(cache, 'cam', frame(5), params='other')
+    assert inferred(cache, 'other', frame(6))
+    assert cache.stats() == {'streams': 2, 'frames': 7, 'skipped': 3, 'inferred': 4}
+
+
+def test_small_object_forces_inference():
+    cache = StreamCache(4, 32, 0.04, 30, 5.0)
+    assert inferred(cache, 'cam', frame(0))
+    # a person-sized region entering the doorway, about 2% of the frame
+    image = frame(1)
+    image[400:600, 900:1000] = np.clip(image[400:600, 900:1000].astype(np.int16) + 80, 0, 255)
+    assert inferred(cache, 'cam', image)
+
+
+def test_disabled():
+    cache = StreamCache(0, 32, 0.04, 30, 5.0)
+    assert inferred(cache, 'cam', frame(0))
+    assert inferred(cache, 'cam', frame(0))
@@ -15,10 +15,19 @@
 
 """Label map utility functions."""
 
+import hashlib
 import logging
+import os
+import tempfile
 
-import tensorflow as tf
+import numpy as np
+try:
+    import tensorflow as tf
+except ImportError:
+    # label maps are then read from local files only
+    tf = None
 from google.protobuf import text_format
+from google.protobuf.message import DecodeError
 from protos import string_int_label_map_pb2
 
 
@@ -93,7 +102,7 @@ def convert_label_map_to_categories(label_map,
       categories: a list of dictionaries representing all possible categories.
     """
     categories = []
-    list_of_ids_already_added = []
+    ids_already_added = set()
     if not label_map:
         label_id_offset = 1
         for class_id in range(max_num_classes):
@@ -111,8 +120,8 @@ def convert_label_map_to_categories(label_map,
             name = item.display_name
         else:
             name = item.name
-        if item.id not in list_of_ids_already_added:
-            list_of_ids_already_added.append(item.id)
+        if item.id not in ids_already_added:
+            ids_already_added.add(item.id)
             categories.append({'id': item.id, 'name': name})
     return categories
 
@@ -124,17 +133,99 @@ def load_labelmap(path):
     Returns:
       a StringIntLabelMapProto
     """
-    with tf.compat.v1.gfile.GFile(path, 'r') as fid:
-        label_map_string = fid.read()
-        label_map = string_int_label_map_pb2.StringIntLabelMap()
-        try:
-            text_format.Merge(label_map_string, label_map)
-        except text_format.ParseError:
-            label_map.ParseFromString(label_map_string)
+    return _parse_labelmap(_read_file(path))
+
+
+def _read_file(path):
+    """Reads the bytes of a file, through tf.gfile when TensorFlow is available."""
+    if tf is None:
+        with open(path, 'rb') as fid:
+            return fid.read()
+    with tf.compat.v1.gfile.GFile(path, 'rb') as fid:
+        return fid.read()
+
+
+def _parse_labelmap(label_map_bytes):
+    label_map = string_int_label_map_pb2.StringIntLabelMap()
+    try:
+        text_format.Merge(label_map_bytes.decode('utf-8'), label_map)
+    except (text_format.ParseError, UnicodeDecodeError):
+        label_map.ParseFromString(label_map_bytes)
     _validate_label_map(label_map)
     return label_map
 
 
+def load_labelmap_cached(path, cache_path):
+    """Loads label map proto, reusing a binary copy of a previously parsed text file.
+
+    Parsing large text label maps with `text_format.Merge` is slow, so the parsed
+    proto is serialized to `cache_path` after a SHA-256 digest of the text file,
+    and reused as long as the digest matches. Unlike modification times, the
+    digest also catches a label map copied in with an older timestamp. A stale
+    or corrupt cache is ignored and rewritten.
+
+    Args:
+      path: path to StringIntLabelMap proto text file.
+      cache_path: path of the binary cache file, or None to disable caching.
+    Returns:
+      a StringIntLabelMapProto
+    """
+    label_map_bytes = _read_file(path)
+    digest = hashlib.sha256(label_map_bytes).digest()
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, 'rb') as fid:
+            cache = fid.read()
+        if cache[:len(digest)] == digest:
+            label_map = string_int_label_map_pb2.StringIntLabelMap()
+            try:
+                label_map.ParseFromString(cache[len(digest):])
+                _validate_label_map(label_map)
+                if label_map.item:
+                    return label_map
+            except (DecodeError, ValueError):
+                pass
+            logging.warning('Ignoring corrupt label map cache %s', cache_path)
+
+    label_map = _parse_labelmap(label_map_bytes)
+    if cache_path:
+        _write_cache(cache_path, digest + label_map.SerializeToString())
+    return label_map
+
+
+def _write_cache(cache_path, data):
+    """Atomically replaces `cache_path` with `data`, so readers never see a partial file."""
+    directory, name = os.path.split(os.path.abspath(cache_path))
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=name + '.', suffix='.tmp')
+    except OSError:
+        logging.warning('Unable to write label map cache %s', cache_path)
+        return
+    try:
+        with os.fdopen(fd, 'wb') as fid:
+            fid.write(data)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        logging.warning('Unable to write label map cache %s', cache_path)
+        os.remove(tmp_path)
+
+
+def create_label_name_table(categories, unknown_name='N/A'):
+    """Creates a dense array mapping category ids to category names.
+
+    Args:
+      categories: a list of dicts with 'id' and 'name' keys.
+      unknown_name: name stored for ids that are not in `categories`.
+    Returns:
+      a numpy object array of length max_id + 1 that can be indexed with an
+      array of class ids.
+    """
+    max_id = max([cat['id'] for cat in categories], default=0)
+    label_names = np.full(max_id + 1, unknown_name, dtype=object)
+    for cat in categories:
+        label_names[cat['id']] = cat['name']
+    return label_names
+
+
 def get_label_map_dict(label_map_path, use_display_name=False):
     """Reads a label map and returns a dictionary of label names to id.
 